@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Compare the selector-based detail extraction with the old get_text scan
+on saved apkdone pages.
+
+    python benchmarks/bench_parser.py --fetch https://apkdone.com/<app>/
+    python benchmarks/bench_parser.py benchmarks/pages/*.html
+"""
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import scraper
+
+PAGES_DIR = Path(__file__).parent / "pages"
+
+def empty_details():
+    return {"version": "", "size": "", "requirements": "", "last_updated": ""}
+
+def timed(func, soup, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        details = empty_details()
+        func(soup, details)
+    return (time.perf_counter() - started) / rounds * 1000, details
+
+def fetch_pages(urls):
+    PAGES_DIR.mkdir(exist_ok=True)
+    saved = []
+    for url in urls:
+        for page_url in (url, url.rstrip("/") + "/download/"):
+            name = re.sub(r'[^a-z0-9]+', '-', page_url.split("://", 1)[-1].lower()).strip("-")
+            path = PAGES_DIR / f"{name}.html"
+            path.write_text(scraper.fetch_page(page_url, cache=False), encoding="utf-8")
+            print(f"saved {path}")
+            saved.append(path)
+    return saved
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages", nargs="*", type=Path, help="saved HTML pages")
+    parser.add_argument("--fetch", nargs="+", metavar="URL", help="download app pages (and their /download/ pages) first")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    pages = list(args.pages)
+    if args.fetch:
+        pages += fetch_pages(args.fetch)
+    if not pages:
+        pages = sorted(PAGES_DIR.glob("*.html"))
+    if not pages:
+        parser.error("no pages given and none saved in benchmarks/pages/")
+
+    total_scan = total_spec = 0.0
+    print(f"{'page':40} {'scan ms':>9} {'spec ms':>9} {'speedup':>8}  same")
+    for path in pages:
+        soup = BeautifulSoup(path.read_text(encoding="utf-8"), "lxml")
+        scan_ms, scanned = timed(scraper.scan_details, soup, args.rounds)
+        spec_ms, extracted = timed(scraper.extract_spec_details, soup, args.rounds)
+        total_scan += scan_ms
+        total_spec += spec_ms
+        same = all(extracted[k] == scanned[k] for k in ("version", "size", "requirements") if extracted[k])
+        print(f"{path.name[:40]:40} {scan_ms:9.2f} {spec_ms:9.2f} {scan_ms / max(spec_ms, 1e-6):7.1f}x  {'yes' if same else 'NO'}")
+        if not same:
+            print(f"    scan: {scanned}\n    spec: {extracted}")
+
+    print(f"{'total':40} {total_scan:9.2f} {total_spec:9.2f} {total_scan / max(total_spec, 1e-6):7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+HTTP response cache for scraped pages
+Entries are fresh for `ttl` seconds, then revalidated with ETag/Last-Modified;
+memory is bounded by total body size and entries can optionally persist to disk
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+class CachedResponse:
+    __slots__ = ("url", "text", "etag", "last_modified", "stored_at")
+
+    def __init__(self, url, text, etag="", last_modified="", stored_at=None):
+        self.url = url
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = time.time() if stored_at is None else stored_at
+
+    @property
+    def size(self):
+        return len(self.text)
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+class ResponseCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=600, stale_ttl=86400, cache_dir=None, max_disk_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl  # how long a stale entry is kept around for revalidation
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stores_since_prune = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _disk_path(self, url):
+        return self.cache_dir / (hashlib.sha1(url.encode()).hexdigest() + ".json")
+
+    def _load_from_disk(self, url):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = CachedResponse(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+        return entry if entry.url == url else None
+
+    def _save_to_disk(self, entry):
+        path = self._disk_path(entry.url)
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry.to_dict(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Response cache write failed: {e}")
+        self._stores_since_prune += 1
+        if self._stores_since_prune >= 100:
+            self._stores_since_prune = 0
+            self.prune_disk()
+
+    def _insert(self, entry):
+        # caller holds the lock
+        old = self._entries.pop(entry.url, None)
+        if old is not None:
+            self._bytes -= old.size
+        if entry.size > self.max_bytes:
+            return
+        self._entries[entry.url] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def lookup(self, url):
+        """Return (entry, fresh); entry is None on a miss, stale entries come back with fresh=False"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+        if entry is None:
+            entry = self._load_from_disk(url)
+            if entry is not None:
+                with self._lock:
+                    self._insert(entry)
+        age = time.time() - entry.stored_at if entry else None
+        if entry is None or age > self.stale_ttl:
+            self.misses += 1
+            return None, False
+        if age < self.ttl:
+            self.hits += 1
+            return entry, True
+        return entry, False
+
+    @staticmethod
+    def validators(entry):
+        """Conditional request headers for revalidating a stale entry"""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, url, text, headers):
+        cache_control = headers.get("Cache-Control", "").lower()
+        if "no-store" in cache_control:
+            return
+        entry = CachedResponse(url, text, headers.get("ETag", ""), headers.get("Last-Modified", ""))
+        with self._lock:
+            self._insert(entry)
+        if self.cache_dir:
+            self._save_to_disk(entry)
+
+    def refresh(self, entry):
+        """A 304 came back: the cached body is fresh again"""
+        self.revalidated += 1
+        entry.stored_at = time.time()
+        if self.cache_dir:
+            self._save_to_disk(entry)
+
+    def prune_disk(self):
+        """Delete expired files, then the oldest ones until under max_disk_bytes"""
+        if not self.cache_dir:
+            return
+        files = []
+        now = time.time()
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.stale_ttl:
+                path.unlink(missing_ok=True)
+            else:
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "evictions": self.evictions
+        }
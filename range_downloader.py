@@ -0,0 +1,167 @@
+"""
+Multi-connection HTTP range downloader
+The target file is preallocated and split into one byte range per connection;
+each worker writes its range in place with pwrite through a large buffer.
+Progress is checkpointed to a <file>.part.json sidecar, so an interrupted
+download resumes where each range left off instead of starting over.
+"""
+import os
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from contextlib import nullcontext
+
+CONNECTIONS = int(os.environ.get("DOWNLOAD_CONNECTIONS", "8"))
+MIN_RANGE_SIZE = 2 * 1024 * 1024  # never split below this; small files use fewer connections
+READ_CHUNK = 256 * 1024
+WRITE_BUFFER = 1024 * 1024
+CHECKPOINT_INTERVAL = 1.0
+RANGE_RETRIES = 3
+RANGE_TIMEOUT = 120
+
+class RangeNotSupported(Exception):
+    """The server ignored a Range request; the caller should fall back to one stream"""
+
+def plan_ranges(size, connections=CONNECTIONS, min_size=MIN_RANGE_SIZE):
+    """Split [0, size) into inclusive [start, end] ranges, at most `connections` of them"""
+    count = max(1, min(connections, size // min_size))
+    step = -(-size // count)
+    return [[start, min(start + step, size) - 1] for start in range(0, size, step)]
+
+class RangeDownload:
+    def __init__(self, session, url, path, size, validator="", headers=None,
+                 connections=CONNECTIONS, slot=None, progress=None):
+        self.session = session  # keeps its cookies, so Cloudflare clearance carries over
+        self.url = url
+        self.path = str(path)
+        self.part_path = self.path + ".part"
+        self.state_path = self.path + ".part.json"
+        self.size = size
+        self.validator = validator  # ETag or Last-Modified; a change invalidates saved progress
+        self.headers = headers or {}
+        self.connections = connections
+        self.slot = slot or (lambda url: nullcontext())
+        self.progress = progress
+        self._ranges = []  # [start, end, done]
+        self._lock = threading.Lock()
+        self._abort = threading.Event()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if (state["url"], state["size"], state["validator"]) != (self.url, self.size, self.validator):
+                return None
+            if os.path.getsize(self.part_path) != self.size:
+                return None
+            return [list(r) for r in state["ranges"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _save_state(self):
+        with self._lock:
+            state = {"url": self.url, "size": self.size, "validator": self.validator, "ranges": self._ranges}
+            data = json.dumps(state)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.state_path)
+
+    def _preallocate(self):
+        with open(self.part_path, "wb") as f:
+            try:
+                os.posix_fallocate(f.fileno(), 0, self.size)
+            except (AttributeError, OSError):
+                f.truncate(self.size)
+
+    def _downloaded(self):
+        return sum(r[2] for r in self._ranges)
+
+    def _flush(self, fd, index, buffer):
+        r = self._ranges[index]
+        view = memoryview(buffer)
+        offset = r[0] + r[2]
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+        with self._lock:
+            r[2] += len(buffer)
+            downloaded = self._downloaded()
+        if self.progress:
+            self.progress(downloaded, self.size)
+
+    def _fetch(self, fd, index):
+        for attempt in range(RANGE_RETRIES + 1):
+            start, end, done = self._ranges[index]
+            if start + done > end or self._abort.is_set():
+                return
+            headers = {**self.headers, "Range": f"bytes={start + done}-{end}"}
+            buffer = bytearray()
+            try:
+                with self.slot(self.url):
+                    response = self.session.get(self.url, headers=headers, stream=True, timeout=RANGE_TIMEOUT)
+                with response:
+                    if response.status_code != 206:
+                        raise RangeNotSupported(f"HTTP {response.status_code} for a range request")
+                    if not response.headers.get("Content-Range", "").startswith(f"bytes {start + done}-"):
+                        raise RangeNotSupported("server answered with a different range")
+                    for chunk in response.iter_content(chunk_size=READ_CHUNK):
+                        if self._abort.is_set():
+                            break
+                        buffer += chunk
+                        if len(buffer) >= WRITE_BUFFER:
+                            self._flush(fd, index, buffer)
+                            buffer = bytearray()
+                if buffer:
+                    self._flush(fd, index, buffer)
+                    buffer = bytearray()
+                if self._abort.is_set() or self._ranges[index][0] + self._ranges[index][2] > end:
+                    return
+                raise IOError("connection closed before the range was complete")
+            except RangeNotSupported:
+                raise
+            except Exception as e:
+                if buffer:
+                    self._flush(fd, index, buffer)  # keep what arrived intact
+                if attempt == RANGE_RETRIES:
+                    raise
+                delay = min(8.0, 0.5 * (2 ** attempt))
+                print(f"Range {index} failed ({e}), retrying")
+                time.sleep(delay / 2 + random.uniform(0, delay / 2))
+
+    def run(self):
+        """Download to path; returns it. Raises RangeNotSupported if the server won't do ranges."""
+        ranges = self._load_state()
+        if ranges is None:
+            self._preallocate()
+            ranges = [[start, end, 0] for start, end in plan_ranges(self.size, self.connections)]
+        else:
+            print(f"Resuming {os.path.basename(self.path)} from {sum(r[2] for r in ranges)} bytes")
+        self._ranges = ranges
+        self._save_state()
+
+        pending = [i for i, (start, end, done) in enumerate(ranges) if start + done <= end]
+        fd = os.open(self.part_path, os.O_RDWR)
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, len(pending)), thread_name_prefix="range") as pool:
+                futures = [pool.submit(self._fetch, fd, index) for index in pending]
+                while True:
+                    finished, running = wait(futures, timeout=CHECKPOINT_INTERVAL, return_when=FIRST_EXCEPTION)
+                    self._save_state()
+                    failed = [f for f in finished if f.exception() is not None]
+                    if failed:
+                        self._abort.set()
+                        wait(running)
+                        self._save_state()
+                        raise failed[0].exception()
+                    if not running:
+                        break
+        finally:
+            os.close(fd)
+
+        os.replace(self.part_path, self.path)
+        os.unlink(self.state_path)
+        return self.path
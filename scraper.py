@@ -3,8 +3,21 @@ from bs4 import BeautifulSoup
 import time
 import re
 import os
+import random
+import shutil
+import hashlib
+import asyncio
+import threading
 import cloudscraper
-from difflib import SequenceMatcher
+import httpx
+from cloudscraper import CipherSuiteAdapter
+from requests.adapters import HTTPAdapter
+from contextlib import contextmanager, asynccontextmanager
+from urllib.parse import urlparse
+from http_cache import ResponseCache
+from sitemap_index import SitemapIndex
+from sitemap_loader import SitemapLoader
+from range_downloader import RangeDownload, RangeNotSupported, CONNECTIONS as DOWNLOAD_CONNECTIONS, MIN_RANGE_SIZE, READ_CHUNK, WRITE_BUFFER
 
 BASE_URL = "https://apkdone.com"
 
@@ -14,187 +27,487 @@ HEADERS = {
     "Accept-Language": "en-US,en;q=0.5",
 }
 
-scraper = cloudscraper.create_scraper()
+# Connection pool sizing shared by the sync (cloudscraper) and async (httpx) paths
+POOL_CONNECTIONS = int(os.environ.get("SCRAPER_POOL_CONNECTIONS", "10"))
+POOL_MAXSIZE = int(os.environ.get("SCRAPER_POOL_MAXSIZE", "32"))
+KEEPALIVE_CONNECTIONS = int(os.environ.get("SCRAPER_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.environ.get("SCRAPER_KEEPALIVE_EXPIRY", "30"))
+
+# Max requests in flight per host; anything not listed gets DEFAULT_HOST_LIMIT
+HOST_LIMITS = {
+    "apkdone.com": 8,
+    "hole.apkdone.io": 4,
+    "file.apkdone.io": 4,
+}
+DEFAULT_HOST_LIMIT = 8
+for _item in os.environ.get("SCRAPER_HOST_LIMITS", "").split(","):
+    if "=" in _item:
+        _host, _limit = _item.split("=", 1)
+        HOST_LIMITS[_host.strip()] = int(_limit)
+
+BACKOFF_MAX = 8.0
+# Retrying these won't help
+FATAL_STATUSES = (400, 401, 404, 410)
+
+def _create_scraper():
+    session = cloudscraper.create_scraper()
+    pool = {"pool_connections": POOL_CONNECTIONS, "pool_maxsize": POOL_MAXSIZE}
+    # Same TLS settings cloudscraper mounts itself, so the browser fingerprint is unchanged
+    session.mount("https://", CipherSuiteAdapter(
+        cipherSuite=session.cipherSuite,
+        ecdhCurve=session.ecdhCurve,
+        server_hostname=session.server_hostname,
+        source_address=session.source_address,
+        ssl_context=session.ssl_context,
+        **pool
+    ))
+    session.mount("http://", HTTPAdapter(**pool))
+    return session
+
+scraper = _create_scraper()
+
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", "600"))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_DIR = os.environ.get("RESPONSE_CACHE_DIR") or None  # set to persist pages across restarts
+
+response_cache = ResponseCache(
+    max_bytes=RESPONSE_CACHE_MAX_BYTES,
+    ttl=RESPONSE_CACHE_TTL,
+    cache_dir=RESPONSE_CACHE_DIR
+)
 
 _sitemap_cache = None
 _sitemap_cache_time = 0
+_sitemap_index = None
+_sitemap_refresh_lock = threading.Lock()
+_sitemap_last_error = ""
+_sitemap_last_refresh_seconds = None
+SITEMAP_RETRY_DELAY = 60
 CACHE_DURATION = 3600
 
-def fetch_page(url, retries=2, delay=0.5):
+# Status codes apkdone's Cloudflare front returns for a JS challenge; plain
+# httpx can't solve those, so the async path hands them to cloudscraper.
+CHALLENGE_STATUSES = (403, 429, 503)
+
+VERSION_RE = re.compile(r'(\d+\.\d+[\d.]*)')
+SIZE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(MB|GB|KB)', re.IGNORECASE)
+ANDROID_RE = re.compile(r'Android\s*[\d.]+')
+
+# Labels of the info table/spec list on app and download pages. Matching them
+# on text nodes finds the rows directly instead of calling get_text on every
+# element, which re-reads all descendant text at each nesting level.
+SPEC_LABEL_RE = re.compile(r'^\s*(?:latest\s+)?(version|file size|size|requires|requirements|android|last updated|updated|update)\b', re.I)
+SPEC_FIELDS = {
+    "version": "version",
+    "file size": "size",
+    "size": "size",
+    "requires": "requirements",
+    "requirements": "requirements",
+    "android": "requirements",
+    "last updated": "last_updated",
+    "updated": "last_updated",
+    "update": "last_updated",
+}
+SPEC_LABEL_MAX_LEN = 80
+# The date is only taken from a bare label; "Updated apps" and the like are navigation
+UPDATED_LABEL_RE = re.compile(r'^\s*(?:last\s+)?updated?\s*:?\s*$', re.I)
+
+_async_client = None
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+SLOT_POLL_INTERVAL = 0.05
+
+def _host_of(url):
+    host = urlparse(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+def _host_limit(host):
+    return HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT)
+
+def backoff_delay(attempt, base=0.5, cap=BACKOFF_MAX):
+    """Exponential backoff with jitter: attempt 0 waits ~base, then doubles up to cap"""
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def _host_semaphore(url):
+    host = _host_of(url)
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = _host_semaphores[host] = threading.BoundedSemaphore(_host_limit(host))
+    return semaphore
+
+@contextmanager
+def host_slot(url):
+    """
+    One of the host's HOST_LIMITS request slots. Downloads hold it only while
+    sending the request and read the body after leaving it, so a long transfer
+    never keeps page fetches to the same host waiting.
+    """
+    with _host_semaphore(url):
+        yield
+
+@asynccontextmanager
+async def host_slot_async(url):
+    """
+    The same slots as host_slot, so sync work in threads and async work count
+    against one cap. Polls instead of blocking an executor thread per waiter.
+    """
+    semaphore = _host_semaphore(url)
+    while not semaphore.acquire(blocking=False):
+        await asyncio.sleep(SLOT_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+def _should_retry(error):
+    response = getattr(error, "response", None)
+    return response is None or response.status_code not in FATAL_STATUSES
+
+def _get(url, headers=None, **kwargs):
+    with host_slot(url):
+        response = scraper.get(url, headers={**HEADERS, **(headers or {})}, timeout=kwargs.pop("timeout", 15), **kwargs)
+    if response.status_code != 304:
+        response.raise_for_status()
+    return response
+
+def fetch_page(url, retries=2, delay=0.5, cache=True):
+    entry, fresh = response_cache.lookup(url) if cache else (None, False)
+    if fresh:
+        return entry.text
+    
     for attempt in range(retries):
         try:
-            response = scraper.get(url, headers=HEADERS, timeout=15)
-            response.raise_for_status()
+            response = _get(url, headers=response_cache.validators(entry))
+            if response.status_code == 304 and entry is not None:
+                response_cache.refresh(entry)
+                return entry.text
+            if cache:
+                response_cache.store(url, response.text, response.headers)
             return response.text
         except Exception as e:
-            if attempt < retries - 1:
-                time.sleep(delay)
+            if attempt < retries - 1 and _should_retry(e):
+                time.sleep(backoff_delay(attempt, delay))
             else:
                 raise Exception(f"Failed to fetch {url}: {e}")
 
-def load_sitemap():
-    global _sitemap_cache, _sitemap_cache_time
-    
-    if _sitemap_cache and (time.time() - _sitemap_cache_time) < CACHE_DURATION:
-        return _sitemap_cache
+def get_async_client():
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=15,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=POOL_MAXSIZE,
+                max_keepalive_connections=KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY
+            )
+        )
+    return _async_client
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None and not _async_client.is_closed:
+        await _async_client.aclose()
+    _async_client = None
+
+async def fetch_page_async(url, retries=2, delay=0.5, cache=True):
+    entry, fresh = response_cache.lookup(url) if cache else (None, False)
+    if fresh:
+        return entry.text
     
-    all_urls = []
+    client = get_async_client()
+    validators = response_cache.validators(entry)
+    for attempt in range(retries):
+        try:
+            async with host_slot_async(url):
+                response = await client.get(url, headers=validators)
+            if response.status_code in CHALLENGE_STATUSES:
+                response = await asyncio.to_thread(_get, url, validators)
+            if response.status_code == 304 and entry is not None:
+                response_cache.refresh(entry)
+                return entry.text
+            response.raise_for_status()
+            if cache:
+                response_cache.store(url, response.text, response.headers)
+            return response.text
+        except Exception as e:
+            if attempt < retries - 1 and _should_retry(e):
+                await asyncio.sleep(backoff_delay(attempt, delay))
+            else:
+                raise Exception(f"Failed to fetch {url}: {e}")
+
+def _is_app_url(url):
+    if re.match(r'https://apkdone\.com/[a-z0-9-]+/?$', url):
+        return '/app/' not in url and '/game/' not in url and '/author/' not in url
+    return False
+
+@contextmanager
+def open_stream(url, timeout=30):
+    """Decoded body of url; the host slot is released once the headers arrive"""
+    with host_slot(url):
+        response = scraper.get(url, headers=HEADERS, timeout=timeout, stream=True)
+    try:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        yield response.raw
+    finally:
+        response.close()
+
+sitemap_loader = SitemapLoader(
+    f"{BASE_URL}/sitemap.xml",
+    open_stream=open_stream,
+    url_filter=_is_app_url,
+    sitemap_filter=lambda loc: "post-sitemap" in loc
+)
+
+def _refresh_sitemap_locked():
+    """Download changes and swap in a new index; caller holds _sitemap_refresh_lock"""
+    global _sitemap_cache, _sitemap_cache_time, _sitemap_index, _sitemap_last_error, _sitemap_last_refresh_seconds
     
+    started = time.time()
+    index = SitemapIndex()
     try:
-        sitemap_index = fetch_page(f"{BASE_URL}/sitemap.xml")
-        soup = BeautifulSoup(sitemap_index, "xml")
-        sitemap_urls = [loc.text for loc in soup.find_all("loc") if "post-sitemap" in loc.text]
-        
-        for sitemap_url in sitemap_urls[:15]:
-            try:
-                sitemap_content = fetch_page(sitemap_url)
-                sitemap_soup = BeautifulSoup(sitemap_content, "xml")
-                for loc in sitemap_soup.find_all("loc"):
-                    url = loc.text
-                    if re.match(r'https://apkdone\.com/[a-z0-9-]+/?$', url):
-                        if '/app/' not in url and '/game/' not in url and '/author/' not in url:
-                            all_urls.append(url)
-            except Exception as e:
-                print(f"Error fetching sitemap {sitemap_url}: {e}")
-                continue
+        sitemap_loader.refresh(index.add)
+        _sitemap_last_error = ""
     except Exception as e:
         print(f"Error loading sitemap index: {e}")
-    
-    _sitemap_cache = list(set(all_urls))
+        _sitemap_last_error = str(e)
+        if _sitemap_index is not None and len(_sitemap_index):
+            index = _sitemap_index
+        else:
+            index = SitemapIndex()
+            sitemap_loader.load_snapshot(index.add)
+    
+    _sitemap_index = index
+    _sitemap_cache = index.urls
     _sitemap_cache_time = time.time()
+    if not index.urls:
+        # Nothing to serve yet; try again soon rather than after a full CACHE_DURATION
+        _sitemap_cache_time -= CACHE_DURATION - SITEMAP_RETRY_DELAY
+    _sitemap_last_refresh_seconds = round(time.time() - started, 2)
+
+def _refresh_sitemap_in_background():
+    if not _sitemap_refresh_lock.acquire(blocking=False):
+        return  # a refresh is already in flight
+    try:
+        _refresh_sitemap_locked()
+    finally:
+        _sitemap_refresh_lock.release()
+
+def _load_sitemap_cold():
+    global _sitemap_cache, _sitemap_cache_time, _sitemap_index
+    
+    with _sitemap_refresh_lock:
+        if _sitemap_cache is not None:
+            return  # another caller finished the cold load while we waited
+        
+        # Serve the on-disk snapshot right away, however old; load_sitemap refreshes it if stale
+        age = sitemap_loader.snapshot_age()
+        if age is not None:
+            index = SitemapIndex()
+            sitemap_loader.load_snapshot(index.add)
+            if len(index):
+                _sitemap_index = index
+                _sitemap_cache = index.urls
+                _sitemap_cache_time = time.time() - age
+                return
+        
+        _refresh_sitemap_locked()
+
+def load_sitemap():
+    """
+    Stale-while-revalidate: an expired snapshot keeps being served while a
+    single background thread refreshes it
+    """
+    if _sitemap_cache is None:
+        _load_sitemap_cold()
+    
+    if (time.time() - _sitemap_cache_time) >= CACHE_DURATION and not _sitemap_refresh_lock.locked():
+        threading.Thread(target=_refresh_sitemap_in_background, name="sitemap-refresh", daemon=True).start()
     return _sitemap_cache
 
+def sitemap_stats():
+    return {
+        "urls": len(_sitemap_cache or []),
+        "snapshot_age_seconds": round(time.time() - _sitemap_cache_time) if _sitemap_cache is not None else None,
+        "refreshing": _sitemap_refresh_lock.locked(),
+        "last_refresh_seconds": _sitemap_last_refresh_seconds,
+        "last_error": _sitemap_last_error
+    }
+
+def get_sitemap_index():
+    load_sitemap()
+    return _sitemap_index
+
 def url_to_name(url):
     slug = url.rstrip('/').split('/')[-1]
     name = slug.replace('-', ' ').replace('mod apk', '').replace('apk', '').strip()
     return name.title()
 
-def search_website(query):
-    query_lower = query.lower().strip()
+def parse_search_results(html):
+    soup = BeautifulSoup(html, "lxml")
     results = []
     seen_urls = set()
     
-    try:
-        search_url = f"{BASE_URL}/search/{query.replace(' ', '+')}/"
-        html = scraper.get(search_url, headers=HEADERS, timeout=15).text
-        soup = BeautifulSoup(html, "lxml")
+    results_section = None
+    for header in soup.find_all(['h2', 'h3', 'h4']):
+        if 'result' in header.get_text(strip=True).lower():
+            parent = header.find_parent('section') or header.find_next('div', class_=re.compile(r'grid'))
+            if parent:
+                results_section = parent
+                break
+    
+    search_container = results_section if results_section else soup
+    
+    for card in search_container.select('.app-card, [class*="app-card"]'):
+        title_elem = card.select_one('.app-card-title, h3, h2')
+        link = card.find('a', href=True)
+        category_elem = card.select_one('.app-card-categories, .app-card-category, [class*="category"]')
+        version_elem = card.select_one('.app-card-meta .chip-text, .app-card-meta, .chip-text, [class*="version"]')
+        img_elem = card.find('img')
         
-        results_section = None
-        for header in soup.find_all(['h2', 'h3', 'h4']):
-            if 'result' in header.get_text(strip=True).lower():
-                parent = header.find_parent('section') or header.find_next('div', class_=re.compile(r'grid'))
-                if parent:
-                    results_section = parent
-                    break
+        if not link:
+            continue
+            
+        href = link.get('href', '')
+        if not href or href in seen_urls:
+            continue
+        if '/app/' in href and '/app/' == href.split('apkdone.com')[-1][:5]:
+            continue
+        if '/game/' in href and re.match(r'.*/game/[a-z-]+/$', href):
+            continue
+        if '/search/' in href or '/author/' in href or '/page/' in href:
+            continue
+        if not re.match(r'https://apkdone\.com/[a-z0-9-]+', href):
+            continue
         
-        search_container = results_section if results_section else soup
+        seen_urls.add(href)
         
-        for card in search_container.select('.app-card, [class*="app-card"]'):
-            title_elem = card.select_one('.app-card-title, h3, h2')
-            link = card.find('a', href=True)
-            category_elem = card.select_one('.app-card-categories, .app-card-category, [class*="category"]')
-            version_elem = card.select_one('.app-card-meta .chip-text, .app-card-meta, .chip-text, [class*="version"]')
-            img_elem = card.find('img')
-            
-            if not link:
-                continue
-                
-            href = link.get('href', '')
-            if not href or href in seen_urls:
-                continue
-            if '/app/' in href and '/app/' == href.split('apkdone.com')[-1][:5]:
-                continue
-            if '/game/' in href and re.match(r'.*/game/[a-z-]+/$', href):
-                continue
-            if '/search/' in href or '/author/' in href or '/page/' in href:
-                continue
-            if not re.match(r'https://apkdone\.com/[a-z0-9-]+', href):
-                continue
-            
-            seen_urls.add(href)
-            
-            title = ""
-            if title_elem:
-                title = title_elem.get_text(strip=True)
-            if not title:
-                title = link.get('title', '') or link.get_text(strip=True)
-            if not title or len(title) < 2:
-                title = url_to_name(href)
-            
-            category = category_elem.get_text(strip=True) if category_elem else ""
-            version = version_elem.get_text(strip=True) if version_elem else ""
-            image = ""
-            if img_elem:
-                image = img_elem.get('src', '') or img_elem.get('data-src', '') or img_elem.get('data-lazy-src', '')
-            
-            results.append({
-                "name": title[:80],
-                "url": href,
-                "score": 100,
-                "version": version,
-                "size": "",
-                "category": category,
-                "mod_features": "",
-                "image": image
-            })
+        title = ""
+        if title_elem:
+            title = title_elem.get_text(strip=True)
+        if not title:
+            title = link.get('title', '') or link.get_text(strip=True)
+        if not title or len(title) < 2:
+            title = url_to_name(href)
         
+        category = category_elem.get_text(strip=True) if category_elem else ""
+        version = version_elem.get_text(strip=True) if version_elem else ""
+        image = ""
+        if img_elem:
+            image = img_elem.get('src', '') or img_elem.get('data-src', '') or img_elem.get('data-lazy-src', '')
+        
+        results.append({
+            "name": title[:80],
+            "url": href,
+            "score": 100,
+            "version": version,
+            "size": "",
+            "category": category,
+            "mod_features": "",
+            "image": image
+        })
+    
+    return results
+
+def _search_url(query):
+    return f"{BASE_URL}/search/{query.replace(' ', '+')}/"
+
+def _guessed_url(query):
+    guessed_slug = query.lower().strip().replace(' ', '-')
+    return f"{BASE_URL}/{guessed_slug}/"
+
+def _guessed_result(query, url):
+    return {
+        "name": query.title(),
+        "url": url,
+        "score": 100,
+        "version": "",
+        "size": "",
+        "category": "",
+        "mod_features": "",
+        "image": ""
+    }
+
+def search_sitemap(query, limit=20):
+    results = []
+    for score, url, name in get_sitemap_index().search(query, limit, min_ratio=0.4):
+        results.append({
+            "name": name,
+            "url": url,
+            "score": score,
+            "version": "",
+            "size": "",
+            "category": "",
+            "mod_features": "",
+            "image": ""
+        })
+    return results
+
+def search_website(query):
+    results = []
+    
+    try:
+        with host_slot(BASE_URL):
+            html = scraper.get(_search_url(query), headers=HEADERS, timeout=15).text
+        results = parse_search_results(html)
         if results:
             return results[:20]
     except Exception as e:
         print(f"Direct search failed: {e}")
     
-    guessed_slug = query_lower.replace(' ', '-')
-    guessed_url = f"{BASE_URL}/{guessed_slug}/"
+    guessed_url = _guessed_url(query)
     try:
-        resp = scraper.head(guessed_url, headers=HEADERS, timeout=5)
+        with host_slot(guessed_url):
+            resp = scraper.head(guessed_url, headers=HEADERS, timeout=5)
         if resp.status_code == 200:
-            results.append({
-                "name": query.title(),
-                "url": guessed_url,
-                "score": 100,
-                "version": "",
-                "size": "",
-                "category": "",
-                "mod_features": "",
-                "image": ""
-            })
+            results.append(_guessed_result(query, guessed_url))
     except:
         pass
     
     if not results:
         try:
-            all_urls = load_sitemap()
-            for url in all_urls:
-                slug = url.rstrip('/').split('/')[-1]
-                name = url_to_name(url)
-                score = 0
-                if query_lower in slug:
-                    score = 100
-                elif query_lower in name.lower():
-                    score = 90
-                else:
-                    ratio = SequenceMatcher(None, query_lower, slug).ratio()
-                    if ratio > 0.4:
-                        score = int(ratio * 80)
-                if score > 0:
-                    results.append({
-                        "name": name,
-                        "url": url,
-                        "score": score,
-                        "version": "",
-                        "size": "",
-                        "category": "",
-                        "mod_features": "",
-                        "image": ""
-                    })
-            results.sort(key=lambda x: x["score"], reverse=True)
+            results = search_sitemap(query)
         except:
             pass
     
     return results[:20]
 
-def get_app_details(app_url):
-    html = fetch_page(app_url)
+async def search_website_async(query):
+    results = []
+    
+    try:
+        html = await fetch_page_async(_search_url(query), retries=1)
+        results = await asyncio.to_thread(parse_search_results, html)
+        if results:
+            return results[:20]
+    except Exception as e:
+        print(f"Direct search failed: {e}")
+    
+    guessed_url = _guessed_url(query)
+    try:
+        async with host_slot_async(guessed_url):
+            resp = await get_async_client().head(guessed_url, timeout=5)
+        if resp.status_code == 200:
+            results.append(_guessed_result(query, guessed_url))
+    except:
+        pass
+    
+    if not results:
+        try:
+            results = await asyncio.to_thread(search_sitemap, query)
+        except:
+            pass
+    
+    return results[:20]
+
+def _needs_download_page(details):
+    return not details["size"] or not details["version"] or not details["requirements"]
+
+def parse_app_page(html, app_url):
     soup = BeautifulSoup(html, "lxml")
     
     download_page_url = app_url.rstrip("/") + "/download/"
@@ -216,25 +529,13 @@ def get_app_details(app_url):
     if h1:
         title_text = h1.get_text(strip=True)
         details["name"] = title_text
-        version_match = re.search(r'(\d+\.\d+[\d.]*)', title_text)
+        version_match = VERSION_RE.search(title_text)
         if version_match:
             details["version"] = version_match.group(1)
     
-    for elem in soup.find_all(["div", "span", "td", "tr", "p"]):
-        text = elem.get_text(strip=True)
-        
-        if "Version" in text and not details["version"]:
-            match = re.search(r'(\d+\.\d+[\d.]*)', text)
-            if match:
-                details["version"] = match.group(1)
-        elif "Size" in text:
-            match = re.search(r'(\d+(?:\.\d+)?)\s*(MB|GB|KB)', text, re.IGNORECASE)
-            if match:
-                details["size"] = f"{match.group(1)} {match.group(2).upper()}"
-        elif "Requires" in text or "Android" in text:
-            match = re.search(r'Android\s*[\d.]+', text)
-            if match:
-                details["requirements"] = match.group()
+    extract_spec_details(soup, details)
+    if _needs_download_page(details):
+        scan_details(soup, details)
     
     icon = soup.find("img", class_=re.compile(r'poster|icon|logo', re.I))
     if icon:
@@ -248,42 +549,128 @@ def get_app_details(app_url):
     if developer_link:
         details["publisher"] = developer_link.get_text(strip=True)
     
-    if not details["size"] or not details["version"] or not details["requirements"]:
+    return details
+
+def _spec_value(node):
+    """Text of the value that belongs to a label text node"""
+    label = node.parent
+    rest = SPEC_LABEL_RE.sub('', str(node), count=1).strip(' :\n\t')
+    if rest:
+        return rest
+    sibling = label.find_next_sibling()
+    if sibling is None and label.parent is not None and label.name not in ("td", "th", "dt", "li"):
+        sibling = label.parent.find_next_sibling()
+    return sibling.get_text(" ", strip=True) if sibling is not None else ""
+
+def extract_spec_details(soup, details):
+    """Fill empty fields from labelled info rows; returns the fields still missing"""
+    for node in soup.find_all(string=SPEC_LABEL_RE):
+        text = str(node).strip()
+        if len(text) > SPEC_LABEL_MAX_LEN or node.parent is None or node.parent.name in ("script", "style", "title"):
+            continue
+        field = SPEC_FIELDS[SPEC_LABEL_RE.match(text).group(1).lower()]
+        if details[field] or (field == "last_updated" and not UPDATED_LABEL_RE.match(text)):
+            continue
+        value = _spec_value(node)
+        combined = f"{text} {value}"
+        
+        if field == "version":
+            match = VERSION_RE.search(combined)
+            if match:
+                details["version"] = match.group(1)
+        elif field == "size":
+            match = SIZE_RE.search(combined)
+            if match:
+                details["size"] = f"{match.group(1)} {match.group(2).upper()}"
+        elif field == "requirements":
+            match = ANDROID_RE.search(combined)
+            if match:
+                details["requirements"] = match.group()
+        elif value and len(value) <= 40:
+            details["last_updated"] = value
+    
+    return [field for field in ("version", "size", "requirements") if not details[field]]
+
+def scan_details(soup, details, tags=("div", "span", "td", "tr", "p")):
+    """Heuristic fallback: get_text on every candidate element, fills only empty fields"""
+    found = {"version": "", "size": "", "requirements": ""}
+    for elem in soup.find_all(list(tags)):
+        text = elem.get_text(strip=True)
+        
+        if "Version" in text and not found["version"]:
+            match = VERSION_RE.search(text)
+            if match:
+                found["version"] = match.group(1)
+        elif "Size" in text:
+            match = SIZE_RE.search(text)
+            if match:
+                found["size"] = f"{match.group(1)} {match.group(2).upper()}"
+        elif "Requires" in text or "Android" in text:
+            match = ANDROID_RE.search(text)
+            if match:
+                found["requirements"] = match.group()
+    
+    for field, value in found.items():
+        if not details[field]:
+            details[field] = value
+    return details
+
+def _fill_missing_details(details, soup):
+    """Download page fallback: the first match fills each still-empty field"""
+    if not extract_spec_details(soup, details):
+        return details
+    for elem in soup.find_all(["div", "span", "td", "tr", "p", "li"]):
+        if not _needs_download_page(details):
+            break
+        text = elem.get_text(strip=True)
+        
+        if not details["version"] and "Version" in text:
+            match = VERSION_RE.search(text)
+            if match:
+                details["version"] = match.group(1)
+        
+        if not details["size"] and "Size" in text:
+            match = SIZE_RE.search(text)
+            if match:
+                details["size"] = f"{match.group(1)} {match.group(2).upper()}"
+        
+        if not details["requirements"] and ("Requires" in text or "Android" in text):
+            match = ANDROID_RE.search(text)
+            if match:
+                details["requirements"] = match.group()
+    
+    return details
+
+def fill_details_from_download_page(details, html):
+    return _fill_missing_details(details, BeautifulSoup(html, "lxml"))
+
+def get_app_details(app_url):
+    html = fetch_page(app_url)
+    details = parse_app_page(html, app_url)
+    
+    if _needs_download_page(details):
         try:
-            download_html = fetch_page(download_page_url)
-            download_soup = BeautifulSoup(download_html, "lxml")
-            
-            for elem in download_soup.find_all(["div", "span", "td", "tr", "p", "li"]):
-                text = elem.get_text(strip=True)
-                
-                if not details["version"] and "Version" in text:
-                    match = re.search(r'(\d+\.\d+[\d.]*)', text)
-                    if match:
-                        details["version"] = match.group(1)
-                
-                if not details["size"] and "Size" in text:
-                    match = re.search(r'(\d+(?:\.\d+)?)\s*(MB|GB|KB)', text, re.IGNORECASE)
-                    if match:
-                        details["size"] = f"{match.group(1)} {match.group(2).upper()}"
-                
-                if not details["requirements"] and ("Requires" in text or "Android" in text):
-                    match = re.search(r'Android\s*[\d.]+', text)
-                    if match:
-                        details["requirements"] = match.group()
+            download_html = fetch_page(details["download_page"])
+            fill_details_from_download_page(details, download_html)
         except Exception as e:
             print(f"Could not fetch download page for details: {e}")
     
     return details
 
-def get_download_links(app_url):
-    download_url = app_url.rstrip("/") + "/download/"
+async def get_app_details_async(app_url):
+    html = await fetch_page_async(app_url)
+    details = await asyncio.to_thread(parse_app_page, html, app_url)
     
-    try:
-        html = fetch_page(download_url)
-    except:
-        html = fetch_page(app_url)
+    if _needs_download_page(details):
+        try:
+            download_html = await fetch_page_async(details["download_page"])
+            await asyncio.to_thread(fill_details_from_download_page, details, download_html)
+        except Exception as e:
+            print(f"Could not fetch download page for details: {e}")
     
-    soup = BeautifulSoup(html, "lxml")
+    return details
+
+def _extract_download_links(soup):
     hole_links = []
     file_links = []
     other_links = []
@@ -293,7 +680,7 @@ def get_download_links(app_url):
         text = link.get_text(strip=True)
         
         if "hole.apkdone.io" in href:
-            size_match = re.search(r'(\d+(?:\.\d+)?)\s*(MB|GB|KB)', text, re.IGNORECASE)
+            size_match = SIZE_RE.search(text)
             size = f"{size_match.group(1)} {size_match.group(2).upper()}" if size_match else ""
             
             hole_links.append({
@@ -303,7 +690,7 @@ def get_download_links(app_url):
                 "direct": True
             })
         elif "file.apkdone.io" in href:
-            size_match = re.search(r'(\d+(?:\.\d+)?)\s*(MB|GB|KB)', text, re.IGNORECASE)
+            size_match = SIZE_RE.search(text)
             size = f"{size_match.group(1)} {size_match.group(2).upper()}" if size_match else ""
             
             file_links.append({
@@ -336,80 +723,171 @@ def get_download_links(app_url):
     
     return downloads
 
-def download_file(url, output_dir="downloads"):
-    os.makedirs(output_dir, exist_ok=True)
+def parse_download_links(html):
+    return _extract_download_links(BeautifulSoup(html, "lxml"))
+
+def parse_download_page(html, details):
+    """One parse of /download/: fills gaps in details and returns the links"""
+    soup = BeautifulSoup(html, "lxml")
+    if _needs_download_page(details):
+        _fill_missing_details(details, soup)
+    return _extract_download_links(soup)
+
+def get_download_links(app_url):
+    download_url = app_url.rstrip("/") + "/download/"
+    
+    try:
+        html = fetch_page(download_url)
+    except:
+        html = fetch_page(app_url)
+    
+    return parse_download_links(html)
+
+async def get_download_links_async(app_url):
+    download_url = app_url.rstrip("/") + "/download/"
+    
+    try:
+        html = await fetch_page_async(download_url)
+    except:
+        html = await fetch_page_async(app_url)
     
-    response = scraper.get(url, headers=HEADERS, stream=True, timeout=120, allow_redirects=True)
-    response.raise_for_status()
+    return await asyncio.to_thread(parse_download_links, html)
+
+def get_app_bundle(app_url):
+    """Details and download links for one app, fetching each page at most once"""
+    html = fetch_page(app_url)
+    details = parse_app_page(html, app_url)
+    
+    try:
+        download_html = fetch_page(details["download_page"])
+        download_links = parse_download_page(download_html, details)
+    except Exception as e:
+        print(f"Could not fetch download page: {e}")
+        download_links = parse_download_links(html)
+    
+    return {"details": details, "download_links": download_links}
+
+async def get_app_bundle_async(app_url):
+    download_page_url = app_url.rstrip("/") + "/download/"
+    html, download_html = await asyncio.gather(
+        fetch_page_async(app_url),
+        fetch_page_async(download_page_url),
+        return_exceptions=True
+    )
+    if isinstance(html, BaseException):
+        raise html
+    
+    details = await asyncio.to_thread(parse_app_page, html, app_url)
+    if isinstance(download_html, BaseException):
+        print(f"Could not fetch download page: {download_html}")
+        download_links = await asyncio.to_thread(parse_download_links, html)
+    else:
+        download_links = await asyncio.to_thread(parse_download_page, download_html, details)
     
-    content_disp = response.headers.get("Content-Disposition", "")
+    return {"details": details, "download_links": download_links}
+
+def filename_from_response(headers, final_url):
+    """Pick a safe local filename from Content-Disposition, else the final URL"""
+    content_disp = headers.get("Content-Disposition", "")
     if "filename=" in content_disp:
         filename = re.search(r'filename="?([^";\n]+)"?', content_disp)
         filename = filename.group(1) if filename else "download.apk"
     else:
-        final_url = response.url
-        filename = final_url.split("/")[-1].split("?")[0] or "download.apk"
+        filename = str(final_url).split("/")[-1].split("?")[0] or "download.apk"
         if not filename.endswith((".apk", ".xapk", ".zip")):
             filename += ".apk"
     
-    filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
-    filepath = os.path.join(output_dir, filename)
-    
-    total_size = int(response.headers.get("content-length", 0))
-    downloaded = 0
-    
-    with open(filepath, "wb") as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            if chunk:
-                f.write(chunk)
-                downloaded += len(chunk)
-                if total_size > 0:
-                    percent = (downloaded / total_size) * 100
-                    print(f"\rDownloading: {percent:.1f}%", end="", flush=True)
-    
-    print()
-    return filepath
+    return re.sub(r'[<>:"/\\|?*]', '_', filename)
 
-def scrape_games(page=1, limit=20):
-    url = f"{BASE_URL}/game/"
-    if page > 1:
-        url = f"{BASE_URL}/game/page/{page}/"
-    
-    html = fetch_page(url)
-    soup = BeautifulSoup(html, "lxml")
-    
-    games = []
-    seen_urls = set()
+def _probe_download(url):
+    """HEAD the download: (final url, headers) if it can be fetched in ranges, else None"""
+    try:
+        with host_slot(url):
+            response = scraper.head(url, headers=HEADERS, timeout=30, allow_redirects=True)
+    except requests.RequestException as e:
+        print(f"HEAD failed for {url}: {e}")
+        return None
+    if response.status_code != 200 or response.headers.get("Accept-Ranges", "").lower() != "bytes":
+        return None
+    if int(response.headers.get("Content-Length", 0) or 0) < MIN_RANGE_SIZE:
+        return None
+    return response.url, response.headers
+
+_resume_locks = {}
+_resume_locks_lock = threading.Lock()
+
+def _resume_lock(path):
+    """One download at a time may work on a resume directory"""
+    with _resume_locks_lock:
+        return _resume_locks.setdefault(path, threading.Lock())
+
+def download_file(url, output_dir="downloads", progress=None, connections=DOWNLOAD_CONNECTIONS, resume_dir=None):
+    """
+    Download url into output_dir and return the file path; progress, if given,
+    is called with (downloaded, total) bytes. Servers that accept ranges get
+    parallel range requests, at most `connections` and never more than the
+    host's slot limit; anything else a single stream. With resume_dir, the
+    partial file and its .part.json sidecar are kept there under a name derived
+    from url, so a later call for the same url resumes where a failed one stopped.
+    """
+    os.makedirs(output_dir, exist_ok=True)
     
-    for link in soup.find_all("a", href=re.compile(r'apkdone\.com/[a-z0-9-]+/?$')):
-        href = link.get("href", "")
-        if href in seen_urls or '/game/' in href or '/app/' in href:
-            continue
-        seen_urls.add(href)
+    probe = _probe_download(url) if connections > 1 else None
+    if probe:
+        final_url, headers = probe
+        filename = filename_from_response(headers, final_url)
+        work_dir = os.path.join(resume_dir, hashlib.sha1(url.encode()).hexdigest()[:16]) if resume_dir else output_dir
+        os.makedirs(work_dir, exist_ok=True)
+        download = RangeDownload(
+            scraper, final_url, os.path.join(work_dir, filename), int(headers["Content-Length"]),
+            validator=headers.get("ETag") or headers.get("Last-Modified", ""),
+            headers=HEADERS, connections=min(connections, _host_limit(_host_of(final_url))),
+            slot=host_slot, progress=progress
+        )
+        try:
+            with _resume_lock(work_dir):
+                path = download.run()
+            filepath = os.path.join(output_dir, filename)
+            if path != filepath:
+                shutil.move(path, filepath)
+                shutil.rmtree(work_dir, ignore_errors=True)
+            return filepath
+        except RangeNotSupported as e:
+            print(f"Parallel download unavailable ({e}), using a single stream")
+    
+    return _download_single(url, output_dir, progress)
+
+def _download_single(url, output_dir, progress=None):
+    with host_slot(url):
+        response = scraper.get(url, headers=HEADERS, stream=True, timeout=120, allow_redirects=True)
+    with response:
+        response.raise_for_status()
         
-        name = link.get("title", "") or link.get_text(strip=True) or url_to_name(href)
-        if name and len(name) > 2:
-            games.append({
-                "name": name,
-                "url": href,
-                "version": "",
-                "size": "",
-                "category": "Game",
-                "mod_features": "",
-                "image": ""
-            })
-    
-    return games[:limit]
+        filename = filename_from_response(response.headers, response.url)
+        filepath = os.path.join(output_dir, filename)
+        
+        total_size = int(response.headers.get("content-length", 0))
+        downloaded = 0
+        last_percent = -1
+        
+        with open(filepath, "wb", buffering=WRITE_BUFFER) as f:
+            for chunk in response.iter_content(chunk_size=READ_CHUNK):
+                if chunk:
+                    f.write(chunk)
+                    downloaded += len(chunk)
+                    if progress:
+                        progress(downloaded, total_size)
+                    if total_size > 0 and downloaded * 100 // total_size != last_percent:
+                        last_percent = downloaded * 100 // total_size
+                        print(f"\rDownloading: {last_percent}%", end="", flush=True)
+        
+        print()
+        return filepath
 
-def scrape_apps(page=1, limit=20):
-    url = f"{BASE_URL}/app/"
-    if page > 1:
-        url = f"{BASE_URL}/app/page/{page}/"
-    
-    html = fetch_page(url)
+def parse_listing(html, category, limit=20):
     soup = BeautifulSoup(html, "lxml")
     
-    apps = []
+    items = []
     seen_urls = set()
     
     for link in soup.find_all("a", href=re.compile(r'apkdone\.com/[a-z0-9-]+/?$')):
@@ -420,17 +898,38 @@ def scrape_apps(page=1, limit=20):
         
         name = link.get("title", "") or link.get_text(strip=True) or url_to_name(href)
         if name and len(name) > 2:
-            apps.append({
+            items.append({
                 "name": name,
                 "url": href,
                 "version": "",
                 "size": "",
-                "category": "App",
+                "category": category,
                 "mod_features": "",
                 "image": ""
             })
     
-    return apps[:limit]
+    return items[:limit]
+
+def _listing_url(section, page):
+    if page > 1:
+        return f"{BASE_URL}/{section}/page/{page}/"
+    return f"{BASE_URL}/{section}/"
+
+def scrape_games(page=1, limit=20):
+    html = fetch_page(_listing_url("game", page))
+    return parse_listing(html, "Game", limit)
+
+async def scrape_games_async(page=1, limit=20):
+    html = await fetch_page_async(_listing_url("game", page))
+    return await asyncio.to_thread(parse_listing, html, "Game", limit)
+
+def scrape_apps(page=1, limit=20):
+    html = fetch_page(_listing_url("app", page))
+    return parse_listing(html, "App", limit)
+
+async def scrape_apps_async(page=1, limit=20):
+    html = await fetch_page_async(_listing_url("app", page))
+    return await asyncio.to_thread(parse_listing, html, "App", limit)
 
 def scrape_homepage():
     html = fetch_page(BASE_URL)
@@ -4,7 +4,9 @@ import time
 import re
 import os
 import cloudscraper
-from difflib import SequenceMatcher
+from contextlib import contextmanager
+from sitemap_index import SitemapIndex
+from sitemap_loader import SitemapLoader
 
 BASE_URL = "https://apkdone.com"
 
@@ -18,6 +20,7 @@ scraper = cloudscraper.create_scraper()
 
 _sitemap_cache = None
 _sitemap_cache_time = 0
+_sitemap_index = None
 CACHE_DURATION = 3600
 
 def fetch_page(url, retries=3, delay=2):
@@ -32,39 +35,66 @@ def fetch_page(url, retries=3, delay=2):
             else:
                 raise Exception(f"Failed to fetch {url}: {e}")
 
+def _is_app_url(url):
+    if re.match(r'https://apkdone\.com/[a-z0-9-]+/?$', url):
+        return '/app/' not in url and '/game/' not in url and '/author/' not in url
+    return False
+
+@contextmanager
+def open_stream(url, timeout=30):
+    response = scraper.get(url, headers=HEADERS, timeout=timeout, stream=True)
+    try:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        yield response.raw
+    finally:
+        response.close()
+
+sitemap_loader = SitemapLoader(
+    f"{BASE_URL}/sitemap.xml",
+    open_stream=open_stream,
+    url_filter=_is_app_url,
+    sitemap_filter=lambda loc: "post-sitemap" in loc
+)
+
 def load_sitemap():
-    global _sitemap_cache, _sitemap_cache_time
+    global _sitemap_cache, _sitemap_cache_time, _sitemap_index
     
     if _sitemap_cache and (time.time() - _sitemap_cache_time) < CACHE_DURATION:
         return _sitemap_cache
     
-    all_urls = []
-    
+    if not _sitemap_cache:
+        # Cold start: a recent on-disk snapshot is good enough to serve right away
+        age = sitemap_loader.snapshot_age()
+        if age is not None and age < CACHE_DURATION:
+            index = SitemapIndex()
+            sitemap_loader.load_snapshot(index.add)
+            if len(index):
+                _sitemap_index = index
+                _sitemap_cache = index.urls
+                _sitemap_cache_time = time.time() - age
+                return _sitemap_cache
+    
+    index = SitemapIndex()
     try:
-        sitemap_index = fetch_page(f"{BASE_URL}/sitemap.xml")
-        soup = BeautifulSoup(sitemap_index, "xml")
-        sitemap_urls = [loc.text for loc in soup.find_all("loc") if "post-sitemap" in loc.text]
-        
-        for sitemap_url in sitemap_urls[:15]:
-            try:
-                sitemap_content = fetch_page(sitemap_url)
-                sitemap_soup = BeautifulSoup(sitemap_content, "xml")
-                for loc in sitemap_soup.find_all("loc"):
-                    url = loc.text
-                    if re.match(r'https://apkdone\.com/[a-z0-9-]+/?$', url):
-                        if '/app/' not in url and '/game/' not in url and '/author/' not in url:
-                            all_urls.append(url)
-                time.sleep(0.5)
-            except Exception as e:
-                print(f"Error fetching sitemap {sitemap_url}: {e}")
-                continue
+        sitemap_loader.refresh(index.add)
     except Exception as e:
         print(f"Error loading sitemap index: {e}")
+        if _sitemap_index is not None:
+            index = _sitemap_index
+        else:
+            index = SitemapIndex()
+            sitemap_loader.load_snapshot(index.add)
     
-    _sitemap_cache = list(set(all_urls))
+    _sitemap_index = index
+    _sitemap_cache = index.urls
     _sitemap_cache_time = time.time()
     return _sitemap_cache
 
+def get_sitemap_index():
+    load_sitemap()
+    return _sitemap_index
+
 def url_to_name(url):
     slug = url.rstrip('/').split('/')[-1]
     name = slug.replace('-', ' ').replace('mod apk', '').replace('apk', '').strip()
@@ -74,39 +104,23 @@ def search_website(query):
     query_lower = query.lower().strip()
     
     try:
-        all_urls = load_sitemap()
+        index = get_sitemap_index()
     except:
-        all_urls = []
+        index = SitemapIndex([])
     
     results = []
     
-    for url in all_urls:
-        slug = url.rstrip('/').split('/')[-1]
-        name = url_to_name(url)
-        
-        score = 0
-        if query_lower in slug:
-            score = 100
-        elif query_lower in name.lower():
-            score = 90
-        else:
-            ratio = SequenceMatcher(None, query_lower, slug).ratio()
-            if ratio > 0.5:
-                score = int(ratio * 80)
-        
-        if score > 0:
-            results.append({
-                "name": name,
-                "url": url,
-                "score": score,
-                "version": "",
-                "size": "",
-                "category": "",
-                "mod_features": "",
-                "image": ""
-            })
-    
-    results.sort(key=lambda x: x["score"], reverse=True)
+    for score, url, name in index.search(query_lower, limit=20, min_ratio=0.5):
+        results.append({
+            "name": name,
+            "url": url,
+            "score": score,
+            "version": "",
+            "size": "",
+            "category": "",
+            "mod_features": "",
+            "image": ""
+        })
     
     if not results:
         guessed_slug = query_lower.replace(' ', '-')
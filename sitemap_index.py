@@ -0,0 +1,92 @@
+"""
+Fuzzy search index over sitemap URLs
+Built as the sitemap streams in: a trigram inverted index over slugs and names
+picks a short list of candidates, and only those get a SequenceMatcher score
+"""
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+MAX_CANDIDATES = 200
+
+def slug_of(url):
+    return url.rstrip('/').split('/')[-1]
+
+def slug_to_name(slug):
+    return slug.replace('-', ' ').replace('mod apk', '').replace('apk', '').strip().title()
+
+def trigrams(text):
+    text = f" {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class SitemapIndex:
+    def __init__(self, urls=()):
+        self.urls = []
+        self.slugs = []
+        self.names = []
+        self._lower_names = []
+        self._ids = {}
+        self._postings = defaultdict(list)
+        for url in urls:
+            self.add(url)
+
+    def add(self, url):
+        """Index one URL; duplicates are ignored so streamed input can be fed straight in"""
+        if url in self._ids:
+            return
+        doc_id = len(self.urls)
+        slug = slug_of(url)
+        name = slug_to_name(slug)
+        self._ids[url] = doc_id
+        self.urls.append(url)
+        self.slugs.append(slug)
+        self.names.append(name)
+        self._lower_names.append(name.lower())
+        for gram in trigrams(slug.replace('-', ' ')) | trigrams(name.lower()):
+            self._postings[gram].append(doc_id)
+
+    def __len__(self):
+        return len(self.urls)
+
+    def _candidates(self, query):
+        grams = [gram for gram in trigrams(query) if gram in self._postings]
+        if not grams:
+            return []
+        # Grams shared by most slugs (" ap", "apk", ...) only add noise when rarer ones exist
+        common_limit = len(self.urls) // 2
+        rare = [gram for gram in grams if len(self._postings[gram]) <= common_limit]
+        counts = defaultdict(int)
+        for gram in rare or grams:
+            for doc_id in self._postings[gram]:
+                counts[doc_id] += 1
+        return sorted(counts, key=counts.get, reverse=True)[:MAX_CANDIDATES]
+
+    def score(self, query, doc_id, min_ratio=0.4):
+        """Same scoring the linear scan used: substring hits first, then similarity"""
+        slug = self.slugs[doc_id]
+        if query in slug:
+            return 100
+        if query in self._lower_names[doc_id]:
+            return 90
+        ratio = SequenceMatcher(None, query, slug).ratio()
+        if ratio > min_ratio:
+            return int(ratio * 80)
+        return 0
+
+    def search(self, query, limit=20, min_ratio=0.4):
+        """Top matches as (score, url, name), best first"""
+        query = query.lower().strip()
+        if not query:
+            return []
+        if len(query) < 3:
+            # Too short for trigrams; a plain substring pass is still cheap
+            doc_ids = [i for i, slug in enumerate(self.slugs) if query in slug or query in self._lower_names[i]]
+        else:
+            doc_ids = self._candidates(query)
+
+        hits = []
+        for doc_id in doc_ids:
+            score = self.score(query, doc_id, min_ratio)
+            if score > 0:
+                hits.append((score, doc_id))
+        hits.sort(key=lambda hit: (-hit[0], hit[1]))
+        return [(score, self.urls[doc_id], self.names[doc_id]) for score, doc_id in hits[:limit]]
@@ -0,0 +1,155 @@
+"""
+Incremental sitemap loader with an on-disk snapshot
+Sub-sitemaps are fetched concurrently and each one is stored on disk with the
+<lastmod> the sitemap index reported for it; a refresh only re-downloads the
+sub-sitemaps whose <lastmod> changed. XML is parsed with lxml iterparse
+straight off the response stream, so memory stays flat however large the
+sitemap set is.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from lxml import etree
+
+SNAPSHOT_DIR = Path(__file__).parent / "app_cache" / "sitemaps"
+MAX_WORKERS = int(os.environ.get("SITEMAP_WORKERS", "6"))
+MAX_SITEMAPS = int(os.environ.get("SITEMAP_LIMIT", "0"))  # 0 = every sub-sitemap
+
+def _write_atomic(path, text):
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def iter_elements(stream, tag):
+    """Yield each finished <tag> element (any namespace), freeing it and its siblings afterwards"""
+    for _, elem in etree.iterparse(stream, events=("end",), tag=f"{{*}}{tag}", recover=True, huge_tree=True):
+        yield elem
+        elem.clear()
+        parent = elem.getparent()
+        while parent is not None and elem.getprevious() is not None:
+            del parent[0]
+
+def _child_text(elem, tag):
+    child = elem.find(f"{{*}}{tag}")
+    return (child.text or "").strip() if child is not None else ""
+
+class SitemapLoader:
+    def __init__(self, index_url, open_stream, url_filter, sitemap_filter=lambda loc: True,
+                 snapshot_dir=SNAPSHOT_DIR, max_workers=MAX_WORKERS, max_sitemaps=MAX_SITEMAPS):
+        self.index_url = index_url
+        self.open_stream = open_stream  # url -> context manager yielding a binary file-like
+        self.url_filter = url_filter
+        self.sitemap_filter = sitemap_filter
+        self.snapshot_dir = Path(snapshot_dir)
+        self.max_workers = max_workers
+        self.max_sitemaps = max_sitemaps
+        self._manifest_path = self.snapshot_dir / "manifest.json"
+        self._lock = threading.Lock()
+        self._sink_lock = threading.Lock()
+
+    def _read_manifest(self):
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"checked_at": 0, "sitemaps": {}}
+
+    def _file_for(self, loc):
+        return self.snapshot_dir / (hashlib.sha1(loc.encode()).hexdigest()[:16] + ".txt")
+
+    def _replay(self, loc, sink):
+        """Feed a stored sub-sitemap to sink; False if it isn't on disk"""
+        try:
+            # Under the sink lock: a failed download is replayed while pool threads still feed the sink
+            with open(self._file_for(loc), "r", encoding="utf-8") as f, self._sink_lock:
+                for line in f:
+                    url = line.rstrip("\n")
+                    if url:
+                        sink(url)
+            return True
+        except OSError:
+            return False
+
+    def snapshot_age(self):
+        """Seconds since the snapshot was last checked against the live index, None if there is none"""
+        checked_at = self._read_manifest().get("checked_at", 0)
+        return time.time() - checked_at if checked_at else None
+
+    def load_snapshot(self, sink):
+        """Feed every stored URL to sink without touching the network; returns the sub-sitemap count"""
+        sitemaps = self._read_manifest().get("sitemaps", {})
+        return sum(1 for loc in sitemaps if self._replay(loc, sink))
+
+    def read_index(self):
+        entries = []
+        with self.open_stream(self.index_url) as stream:
+            for sitemap in iter_elements(stream, "sitemap"):
+                loc = _child_text(sitemap, "loc")
+                if loc and self.sitemap_filter(loc):
+                    entries.append((loc, _child_text(sitemap, "lastmod")))
+        return entries[:self.max_sitemaps] if self.max_sitemaps else entries
+
+    def _download(self, loc, sink):
+        """Stream one sub-sitemap to disk and into sink; None on failure"""
+        path = self._file_for(loc)
+        tmp_path = path.with_suffix(".part")
+        count = 0
+        try:
+            with self.open_stream(loc) as stream, open(tmp_path, "w", encoding="utf-8") as out:
+                for url_elem in iter_elements(stream, "url"):
+                    url = _child_text(url_elem, "loc")
+                    if not self.url_filter(url):
+                        continue
+                    out.write(url + "\n")
+                    count += 1
+                    with self._sink_lock:
+                        sink(url)
+            os.replace(tmp_path, path)
+            return count
+        except Exception as e:
+            tmp_path.unlink(missing_ok=True)
+            print(f"Error fetching sitemap {loc}: {e}")
+            return None
+
+    def refresh(self, sink):
+        """
+        Re-read the sitemap index, download only changed sub-sitemaps and feed
+        every current URL to sink (which must tolerate duplicates)
+        """
+        with self._lock:
+            self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+            known = self._read_manifest().get("sitemaps", {})
+            entries = self.read_index()
+            lastmods = dict(entries)
+
+            stale = [
+                loc for loc, lastmod in entries
+                if loc not in known or not lastmod or known[loc].get("lastmod") != lastmod
+                or not self._file_for(loc).exists()
+            ]
+            fresh = [loc for loc, _ in entries if loc not in stale]
+
+            for loc in fresh:
+                self._replay(loc, sink)
+            if stale:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                    counts = pool.map(lambda loc: (loc, self._download(loc, sink)), stale)
+                    for loc, count in counts:
+                        if count is not None:
+                            known[loc] = {"lastmod": lastmods[loc], "count": count, "fetched_at": time.time()}
+                        elif loc in known:
+                            self._replay(loc, sink)  # keep whatever we had for it before
+
+            sitemaps = {loc: meta for loc, meta in known.items() if loc in lastmods}
+            for loc in set(known) - set(lastmods):
+                self._file_for(loc).unlink(missing_ok=True)
+            _write_atomic(self._manifest_path, json.dumps({"checked_at": time.time(), "sitemaps": sitemaps}))
+
+            print(f"Sitemap refreshed: {len(stale)}/{len(entries)} sub-sitemaps downloaded")
+            return len(sitemaps)
@@ -2,21 +2,39 @@
 import os
 import sys
 import re
-import json
+import time
 import asyncio
-import subprocess
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, Query, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Query, BackgroundTasks, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-from scraper import search_website, get_app_details, get_download_links, download_file, scrape_games, scrape_apps
-from search_orchestrator import combined_search, search_google_play, get_google_play_app, get_package_for_slug, is_package_name
+from scraper import (
+    search_website_async, get_app_bundle_async, get_download_links_async, download_file,
+    scrape_games_async, scrape_apps_async, close_async_client, response_cache, sitemap_stats
+)
+from search_orchestrator import combined_search_async, is_package_name, cache_stats, get_latest_version_async
+import gplay_sidecar
+import aria2_daemon
+from aria2_daemon import Aria2Error
+from singleflight import SingleFlight
+from download_coordinator import DownloadCoordinator, staging_dir, clean_staging, clean_resume, RESUME_DIRNAME
+from artifact_store import ArtifactStore, range_sha256, ACCESS_FLUSH_INTERVAL
+from stream_tee import TeeDownload
+from range_response import file_response, content_disposition, FilePartResponse
+from source_race import race, RaceFailed
+
+@asynccontextmanager
+async def lifespan(app):
+    await startup()
+    yield
+    await shutdown()
 
-app = FastAPI(title="APK Download API", version="1.0.0")
+app = FastAPI(title="APK Download API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -31,7 +49,109 @@ DOWNLOAD_DIR.mkdir(exist_ok=True)
 
 APKEEP_PATH = Path(__file__).parent.parent.parent / "apkeep"
 
-async def run_aria2c(url, output_dir, filename=None, referer=None):
+# Downloads go to one shared aria2 daemon over RPC; ARIA2_DAEMON=0 spawns aria2c per file instead
+USE_ARIA2_DAEMON = os.environ.get("ARIA2_DAEMON", "1") != "0"
+
+# /parts splits artifacts into fixed-size pieces; the default matches the bot's WhatsApp upload limit
+PART_SIZE = int(os.environ.get("PART_SIZE_MB", "1024")) * 1024 * 1024
+MIN_PART_SIZE = 1024 * 1024
+
+# Source racing: seconds without a byte from the running sources before the next one joins (0 = all at once, negative = one by one)
+DOWNLOAD_HEDGE_DELAY = float(os.environ.get("DOWNLOAD_HEDGE_DELAY", "10"))
+FAST_DOWNLOAD_HEDGE_DELAY = float(os.environ.get("FAST_DOWNLOAD_HEDGE_DELAY", "-1"))
+
+# Identical concurrent lookups/downloads share one in-flight operation
+inflight = SingleFlight()
+
+# Finished downloads live in a content-addressed store with an LRU disk quota (ARTIFACT_STORE_MAX_GB)
+artifacts = ArtifactStore(DOWNLOAD_DIR, part_size=PART_SIZE)
+
+# Background upstream-version checks triggered by cache hits
+freshness_checks = set()
+
+# package -> (consecutive failures, monotonic time before which its refresh isn't retried)
+refresh_failures = {}
+REFRESH_RETRY_BASE = 300
+REFRESH_RETRY_MAX = 6 * 3600
+
+# One download job per package, run on a pool of DOWNLOAD_WORKERS; requests arriving mid-download join it
+downloads = DownloadCoordinator()
+
+async def startup():
+    removed = clean_staging(DOWNLOAD_DIR)
+    if removed:
+        print(f"Removed {removed} unfinished download(s)")
+    removed = clean_resume(DOWNLOAD_DIR)
+    if removed:
+        print(f"Removed {removed} abandoned partial download(s)")
+    asyncio.get_running_loop().run_in_executor(None, import_legacy_artifacts)
+    app.state.access_flusher = asyncio.ensure_future(flush_artifact_access())
+
+def import_legacy_artifacts():
+    imported = artifacts.import_legacy()
+    if imported:
+        print(f"Moved {imported} previously downloaded file(s) into the artifact store")
+
+async def flush_artifact_access():
+    """Write batched artifact hits to SQLite; off the event loop like every other store write"""
+    while True:
+        await asyncio.sleep(ACCESS_FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(artifacts.flush_access)
+        except Exception as e:
+            print(f"Artifact access flush failed: {e}")
+
+async def shutdown():
+    app.state.access_flusher.cancel()
+    await downloads.close()
+    await asyncio.to_thread(artifacts.flush_access)
+    await close_async_client()
+    gplay_sidecar.shutdown()
+    aria2_daemon.shutdown()
+
+# aria2c summary line: [#2089b0 6.1MiB/33MiB(18%) CN:16 DL:2.3MiB ETA:11s]
+ARIA2_PROGRESS_RE = re.compile(r'\[#\w+ ([\d.]+)(\w*B)/([\d.]+)(\w*B)(?:\(\d+%\))?[^\]]*?DL:([\d.]+)(\w*B)')
+ARIA2_COMPLETE_RE = re.compile(r'Download complete: (.+)$', re.MULTILINE)
+SIZE_UNITS = {"B": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3}
+
+def parse_size(number, unit):
+    return int(float(number) * SIZE_UNITS.get(unit, 1))
+
+async def read_aria2c_output(stream, progress):
+    """Collect aria2c's stdout, feeding each progress summary it prints to progress"""
+    chunks = []
+    tail = ""
+    while True:
+        data = await stream.read(4096)
+        if not data:
+            break
+        chunks.append(data)
+        if progress is None:
+            continue
+        text = tail + data.decode(errors="ignore")
+        matches = ARIA2_PROGRESS_RE.findall(text)
+        if matches:
+            done, done_unit, total, total_unit, speed, speed_unit = matches[-1]
+            progress.update(parse_size(done, done_unit), parse_size(total, total_unit), parse_size(speed, speed_unit))
+        tail = text[-256:]
+    return b"".join(chunks)
+
+async def run_aria2c(url, output_dir, filename=None, referer=None, progress=None):
+    if USE_ARIA2_DAEMON:
+        daemon = aria2_daemon.get_daemon()
+        try:
+            await asyncio.to_thread(daemon.api)
+        except Aria2Error as e:
+            print(f"aria2 daemon unavailable ({e}), spawning aria2c")
+        else:
+            try:
+                filepath = await daemon.download(url, output_dir, filename, referer, progress)
+                return True, filepath, ""
+            except Exception as e:
+                return False, None, str(e)
+    return await spawn_aria2c(url, output_dir, filename, referer, progress)
+
+async def spawn_aria2c(url, output_dir, filename=None, referer=None, progress=None):
     cmd = [
         "aria2c",
         "--max-connection-per-server=16",
@@ -52,6 +172,7 @@ async def run_aria2c(url, output_dir, filename=None, referer=None):
         "--lowest-speed-limit=50K",
         "--async-dns=true",
         "--check-certificate=false",
+        "--summary-interval=1",
         "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
         "-d", str(output_dir),
     ]
@@ -68,8 +189,26 @@ async def run_aria2c(url, output_dir, filename=None, referer=None):
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE
     )
-    stdout, stderr = await process.communicate()
-    return process.returncode == 0, stdout.decode(), stderr.decode()
+    try:
+        stdout, stderr = await asyncio.gather(read_aria2c_output(process.stdout, progress), process.stderr.read())
+        await process.wait()
+    except asyncio.CancelledError:
+        process.kill()  # lost a source race
+        raise
+    if process.returncode != 0:
+        return False, None, stderr.decode()
+    # aria2c logs the path it wrote, so there is no need to guess from the directory
+    match = ARIA2_COMPLETE_RE.search(stdout.decode(errors="ignore"))
+    filepath = Path(match.group(1).strip()) if match else (Path(output_dir) / filename if filename else None)
+    return True, filepath, stderr.decode()
+
+def apkeep_output(package_name, output_dir):
+    """apkeep names its file after the package"""
+    for suffix in (".apk", ".xapk"):
+        path = Path(output_dir) / f"{package_name}{suffix}"
+        if path.exists():
+            return path
+    return None
 
 async def run_apkeep(package_name, output_dir):
     cmd = [
@@ -84,18 +223,34 @@ async def run_apkeep(package_name, output_dir):
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE
     )
-    stdout, stderr = await process.communicate()
+    try:
+        stdout, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()  # lost a source race
+        raise
     return process.returncode == 0, stdout.decode(), stderr.decode()
 
 @app.get("/")
 async def root():
     return {"status": "ok", "message": "APK Download API Server"}
 
+@app.get("/stats")
+async def stats():
+    return {
+        "package_cache": cache_stats(),
+        "http_cache": response_cache.stats(),
+        "sitemap": sitemap_stats(),
+        "inflight": inflight.stats(),
+        "downloads": downloads.stats(),
+        "artifacts": await asyncio.to_thread(artifacts.stats),
+        "aria2": await asyncio.to_thread(aria2_daemon.get_daemon().stats) if USE_ARIA2_DAEMON else None
+    }
+
 @app.get("/search")
 async def search_apps(q: str = Query(..., description="Search query"), num: int = Query(10, description="Number of results"), combined: bool = Query(True, description="Use combined search")):
     try:
         if combined:
-            search_results = combined_search(q, num)
+            search_results = await inflight.do(("search", q.lower().strip(), num), combined_search_async, q, num)
             formatted_results = []
             for app in search_results.get('combined', [])[:num]:
                 source = app.get('source', 'apkdone')
@@ -131,7 +286,7 @@ async def search_apps(q: str = Query(..., description="Search query"), num: int
                     })
             return {"results": formatted_results, "count": len(formatted_results)}
         else:
-            results = search_website(q)
+            results = await inflight.do(("search-apkdone", q.lower().strip()), search_website_async, q)
             formatted_results = []
             for app in results[:num]:
                 formatted_results.append({
@@ -167,17 +322,18 @@ async def get_app_info(app_id: str, url: str = Query(None, description="Direct a
     try:
         if url:
             app_url = url
-            details = get_app_details(app_url)
-            download_links = get_download_links(app_url)
-            results = [{"name": details.get("name", ""), "image": ""}]
+            bundle = await inflight.do(("bundle", app_url), get_app_bundle_async, app_url)
+            results = [{"name": bundle["details"].get("name", ""), "image": ""}]
         else:
-            results = search_website(app_id.replace("-", " "))
+            query = app_id.replace("-", " ")
+            results = await inflight.do(("search-apkdone", query.lower().strip()), search_website_async, query)
             if not results:
                 raise HTTPException(status_code=404, detail="App not found")
             app_url = results[0].get("url", "")
-            details = get_app_details(app_url)
-            download_links = get_download_links(app_url)
+            bundle = await inflight.do(("bundle", app_url), get_app_bundle_async, app_url)
         
+        details = bundle["details"]
+        download_links = bundle["download_links"]
         app_name = details.get("name", results[0].get("name", ""))
         return {
             "appId": app_id,
@@ -198,179 +354,408 @@ async def get_app_info(app_id: str, url: str = Query(None, description="Direct a
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def apk_response(request, artifact, source):
+    """Stored artifact with ETag = its SHA-256, so clients can resume with Range/If-Range"""
+    headers = {"X-Source": source}
+    if artifact["version"]:
+        headers["X-Version"] = artifact["version"]
+    return file_response(
+        request, artifact["path"], artifact["filename"], artifact["size"], artifact["sha256"],
+        media_type="application/vnd.android.package-archive",
+        headers=headers
+    )
+
+def cached_artifact(key):
+    artifact = artifacts.get(key)
+    if artifact is not None:
+        artifacts.touch(key)
+    return artifact
+
+async def store_artifact(key, filepath, source, version=""):
+    return await asyncio.to_thread(artifacts.ingest, key, filepath, source, version)
+
+async def latest_version(package_name):
+    try:
+        return await inflight.do(("version", package_name), get_latest_version_async, package_name)
+    except Exception as e:
+        print(f"Version check failed for {package_name}: {e}")
+        return ""
+
+def record_refresh(package_name, result):
+    """Back off exponentially after a failed refresh so cache hits don't keep resubmitting it"""
+    if result.cancelled() or result.exception() is None:
+        refresh_failures.pop(package_name, None)
+        return
+    failures = refresh_failures.get(package_name, (0, 0))[0] + 1
+    delay = min(REFRESH_RETRY_MAX, REFRESH_RETRY_BASE * 2 ** (failures - 1))
+    refresh_failures[package_name] = (failures, time.monotonic() + delay)
+    print(f"{package_name}: refresh failed ({result.exception()}); next attempt in {delay}s")
+
+async def refresh_if_outdated(package_name, cached_version):
+    failure = refresh_failures.get(package_name)
+    if failure is not None and time.monotonic() < failure[1]:
+        return
+    latest = await latest_version(package_name)
+    if latest and latest != cached_version and downloads.active(package_name) is None:
+        print(f"{package_name}: cached {cached_version or 'untagged'}, upstream {latest}; refreshing in the background")
+        job = downloads.submit(
+            package_name, fetch_package, package_name, DOWNLOAD_DIR / package_name, False, "auto", DOWNLOAD_HEDGE_DELAY
+        )
+        job.result.add_done_callback(lambda result: record_refresh(package_name, result))
+
+def check_freshness(package_name, artifact):
+    """Serve the cached file now; re-download in the background if upstream has a different version"""
+    if downloads.active(package_name) is not None:
+        return
+    task = asyncio.ensure_future(refresh_if_outdated(package_name, artifact["version"]))
+    freshness_checks.add(task)
+    task.add_done_callback(freshness_checks.discard)
+
+async def fetch_package(package_name, output_dir, force_apkeep, source, hedge_delay=-1, progress=None):
+    """Download into a staging directory and hand the file to the artifact store; returns the artifact"""
+    # Tag with the version upstream reports now, so the next freshness check sees it as current
+    version_task = asyncio.ensure_future(latest_version(package_name))
+    with staging_dir(output_dir) as workdir:
+        filepath, file_source = await fetch_package_into(package_name, workdir, force_apkeep, source, hedge_delay, progress)
+        return await store_artifact(package_name, filepath, file_source, await version_task)
+
+async def fetch_package_into(package_name, output_dir, force_apkeep, source, hedge_delay=-1, progress=None):
+    """
+    Race the package's sources; returns (file path, X-Source tag). Package names
+    race apkeep against apkdone; apkdone slugs only use apkeep when they have no
+    links. Within apkdone every direct link is a candidate of its own, so a
+    stalled mirror is hedged like any other source.
+    """
+    use_apkeep_directly = is_package_name(package_name) or source == "google" or force_apkeep
+    
+    # Each source writes into its own directory so a cancelled loser can't clobber the winner's file
+    apkdone = ("apkdone", lambda racer_progress: apkdone_source(
+        package_name, output_dir / "apkdone", racer_progress, not use_apkeep_directly, hedge_delay
+    ))
+    if use_apkeep_directly:
+        apkeep = ("apkeep", lambda racer_progress: apkeep_source(
+            package_name, output_dir / "apkeep", "apkeep+google", racer_progress
+        ))
+        candidates = [apkeep, apkdone]
+    else:
+        candidates = [apkdone]
+    try:
+        return await race(candidates, hedge_delay, progress)
+    except RaceFailed as e:
+        raise HTTPException(status_code=500, detail=f"Download failed: {e}")
+
+def dir_size(directory):
+    size = 0
+    for path in Path(directory).rglob("*"):
+        try:
+            if path.is_file():
+                size += path.stat().st_size
+        except OSError:
+            pass  # renamed or removed while we looked
+    return size
+
+async def watch_size(directory, progress, interval=1.0):
+    """Report the bytes written under directory, for tools that print no progress"""
+    while True:
+        await asyncio.sleep(interval)
+        progress.update(await asyncio.to_thread(dir_size, directory))
+
+async def apkeep_source(package_name, output_dir, tag, progress=None):
+    output_dir.mkdir(exist_ok=True)
+    watcher = asyncio.ensure_future(watch_size(output_dir, progress)) if progress is not None else None
+    try:
+        success, stdout, stderr = await run_apkeep(package_name, output_dir)
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+    filepath = apkeep_output(package_name, output_dir) if success else None
+    if not filepath:
+        raise RuntimeError(stderr.strip() or "apkeep produced no file")
+    return filepath, tag
+
+async def apkdone_source(package_name, output_dir, progress=None, apkeep_fallback=False, hedge_delay=-1):
+    """Race the direct links (see link_source); apkeep if there are none and apkeep_fallback"""
+    output_dir.mkdir(exist_ok=True)
+    urls = await direct_links(package_name)
+    if not urls:
+        if apkeep_fallback:
+            return await apkeep_source(package_name, output_dir / "apkeep", "apkeep", progress)
+        raise RuntimeError("No download links found")
+    candidates = [
+        (f"link {i + 1}", lambda racer_progress, url=url, workdir=output_dir / f"link{i + 1}": link_source(
+            url, workdir, racer_progress
+        ))
+        for i, url in enumerate(urls)
+    ]
+    return await race(candidates, hedge_delay, progress)
+
+async def link_source(url, output_dir, progress=None):
+    """One direct link with aria2c, then cloudscraper"""
+    output_dir.mkdir(exist_ok=True)
+    try:
+        success, filepath, stderr = await run_aria2c(url, output_dir, progress=progress)
+        if success and filepath and filepath.exists():
+            return filepath, "aria2c+apkdone"
+    except Exception as e:
+        print(f"aria2c failed: {e}, trying cloudscraper...")
+    
+    filepath = await asyncio.to_thread(
+        download_file, url, str(output_dir), progress.update if progress else None,
+        resume_dir=str(DOWNLOAD_DIR / RESUME_DIRNAME)
+    )
+    return Path(filepath), "cloudscraper+apkdone"
+
+async def direct_links(package_name):
+    """URLs of the package's direct apkdone links, best first"""
+    from scraper import BASE_URL
+    app_url = f"{BASE_URL}/{package_name}/"
+    download_links = await inflight.do(("links", app_url), get_download_links_async, app_url)
+    return [link['url'] for link in download_links or [] if link.get('direct') and link.get('url')]
+
+async def first_direct_link(package_name):
+    urls = await direct_links(package_name)
+    return urls[0] if urls else None
+
+async def stream_package(package_name, output_dir, tee, progress=None):
+    """Tee the first direct link to disk and live followers; the normal chain takes over if it fails"""
+    version_task = asyncio.ensure_future(latest_version(package_name))
+    with staging_dir(output_dir) as workdir:
+        try:
+            filepath, file_source = await tee.run(workdir, progress), "stream+apkdone"
+        except Exception as e:
+            print(f"Streaming download failed: {e}, falling back to the source chain")
+            filepath, file_source = await fetch_package_into(
+                package_name, workdir, False, "apkdone", DOWNLOAD_HEDGE_DELAY, progress
+            )
+        return await store_artifact(package_name, filepath, file_source, await version_task)
+
+async def submit_stream(package_name, output_dir):
+    download_url = await first_direct_link(package_name)
+    if download_url is None or downloads.active(package_name) is not None:
+        return None
+    tee = TeeDownload(download_url)
+    job = downloads.submit(package_name, stream_package, package_name, output_dir, tee)
+    job.stream = tee
+    return job
+
+async def stream_response(job):
+    """Send the file while the job is still writing it; None if there is nothing live to follow"""
+    tee = job.stream
+    if not await tee.wait_ready():
+        return None
+    try:
+        reader = tee.open_reader()
+    except FileNotFoundError:
+        return None  # already finished and moved into the artifact store
+    headers = {"Content-Disposition": content_disposition(tee.filename), "X-Source": "stream"}
+    if tee.total:
+        headers["Content-Length"] = str(tee.total)
+    return StreamingResponse(tee.follow(reader), media_type="application/vnd.android.package-archive", headers=headers)
+
 @app.get("/download/{package_name}")
-async def download_app(package_name: str, background_tasks: BackgroundTasks, force_apkeep: bool = Query(False), source: str = Query("auto", description="Source: auto, apkdone, google")):
+async def download_app(package_name: str, request: Request, background_tasks: BackgroundTasks, force_apkeep: bool = Query(False), source: str = Query("auto", description="Source: auto, apkdone, google"), wait: bool = Query(True, description="Wait for the file; false returns 202 with a job id"), stream: bool = Query(False, description="Send bytes while the file is still downloading"), hedge_delay: float = Query(DOWNLOAD_HEDGE_DELAY, description="Seconds without data before racing the next source; negative tries them in turn")):
     try:
         output_dir = DOWNLOAD_DIR / package_name
-        output_dir.mkdir(exist_ok=True)
-        
-        existing_files = list(output_dir.glob("*.apk")) + list(output_dir.glob("*.xapk"))
-        if existing_files and not force_apkeep:
-            return FileResponse(
-                path=str(existing_files[0]),
-                filename=existing_files[0].name,
-                media_type="application/vnd.android.package-archive",
-                headers={"X-Source": "cache"}
-            )
-        
-        use_apkeep_directly = is_package_name(package_name) or source == "google" or force_apkeep
-        
-        if use_apkeep_directly:
-            success, stdout, stderr = await run_apkeep(package_name, output_dir)
-            if success:
-                files = list(output_dir.glob("*.apk")) + list(output_dir.glob("*.xapk"))
-                if files:
-                    return FileResponse(
-                        path=str(files[0]),
-                        filename=files[0].name,
-                        media_type="application/vnd.android.package-archive",
-                        headers={"X-Source": "apkeep+google"}
-                    )
-        
-        from scraper import BASE_URL
-        
-        app_url = f"{BASE_URL}/{package_name}/"
-        
-        download_links = get_download_links(app_url)
+        artifact = cached_artifact(package_name)
+        if artifact and not force_apkeep:
+            check_freshness(package_name, artifact)
+            return apk_response(request, artifact, "cache")
         
-        if download_links:
-            for link in download_links:
-                if not link.get('direct'):
-                    continue
-                download_url = link.get('url')
-                if not download_url:
-                    continue
-                
-                try:
-                    success, stdout, stderr = await run_aria2c(download_url, output_dir)
-                    if success:
-                        files = sorted(output_dir.glob("*.*"), key=os.path.getmtime, reverse=True)
-                        apk_files = [f for f in files if f.suffix.lower() in ['.apk', '.xapk', '.zip']]
-                        if apk_files:
-                            return FileResponse(
-                                path=str(apk_files[0]),
-                                filename=apk_files[0].name,
-                                media_type="application/vnd.android.package-archive",
-                                headers={"X-Source": "aria2c+apkdone"}
-                            )
-                except Exception as e:
-                    print(f"aria2c failed: {e}, trying cloudscraper...")
-                
-                try:
-                    filepath = download_file(download_url, str(output_dir))
-                    if Path(filepath).exists():
-                        return FileResponse(
-                            path=filepath,
-                            filename=Path(filepath).name,
-                            media_type="application/vnd.android.package-archive",
-                            headers={"X-Source": "cloudscraper+apkdone"}
-                        )
-                except Exception as e:
-                    print(f"cloudscraper failed: {e}")
-                    continue
-        
-        if force_apkeep or not download_links:
-            success, stdout, stderr = await run_apkeep(package_name, output_dir)
-            
-            if success:
-                files = list(output_dir.glob("*.apk")) + list(output_dir.glob("*.xapk"))
-                if files:
-                    return FileResponse(
-                        path=str(files[0]),
-                        filename=files[0].name,
-                        media_type="application/vnd.android.package-archive",
-                        headers={"X-Source": "apkeep"}
-                    )
-            
-            raise HTTPException(status_code=500, detail=f"Download failed: {stderr}")
-        
-        raise HTTPException(status_code=500, detail="No download links found")
+        job = None
+        # Only apkdone direct links can be teed; apkeep writes its file in one go
+        streamable = not (is_package_name(package_name) or source == "google" or force_apkeep)
+        if stream and streamable and downloads.active(package_name) is None:
+            job = await submit_stream(package_name, output_dir)
+        if job is None:
+            job = downloads.submit(package_name, fetch_package, package_name, output_dir, force_apkeep, source, hedge_delay)
+        if not wait:
+            return JSONResponse(status_code=202, content=job.to_dict())
+        # Ranges are only served from the finished file
+        if stream and job.stream is not None and "range" not in request.headers:
+            response = await stream_response(job)
+            if response is not None:
+                return response
+        artifact = await downloads.wait(job)
+        return apk_response(request, artifact, artifact["source"])
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/download-direct")
-async def download_direct(url: str = Query(...), filename: str = Query(None), referer: str = Query(None)):
+async def download_direct(request: Request, url: str = Query(...), filename: str = Query(None), referer: str = Query(None)):
     try:
-        output_dir = DOWNLOAD_DIR / "direct"
-        output_dir.mkdir(exist_ok=True)
-        
-        success, stdout, stderr = await run_aria2c(url, output_dir, filename, referer)
-        
-        if success:
-            if filename:
-                filepath = output_dir / filename
-            else:
-                downloaded_files = sorted(output_dir.glob("*"), key=os.path.getmtime, reverse=True)
-                if downloaded_files:
-                    filepath = downloaded_files[0]
-                else:
+        key = f"direct:{url}"
+        artifact = cached_artifact(key)
+        if artifact is None:
+            with staging_dir(DOWNLOAD_DIR / "direct") as workdir:
+                success, filepath, stderr = await run_aria2c(url, workdir, filename, referer)
+                if not success:
+                    raise HTTPException(status_code=500, detail=f"Download failed: {stderr}")
+                if not filepath or not filepath.exists():
                     raise HTTPException(status_code=500, detail="No file downloaded")
-            
-            if filepath.exists():
-                return FileResponse(
-                    path=str(filepath),
-                    filename=filepath.name,
-                    media_type="application/octet-stream"
-                )
+                artifact = await store_artifact(key, filepath, "aria2c+direct")
         
-        raise HTTPException(status_code=500, detail=f"Download failed: {stderr}")
+        return file_response(
+            request, artifact["path"], filename or artifact["filename"], artifact["size"], artifact["sha256"],
+            media_type="application/octet-stream"
+        )
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def fast_fetch_package(package_name, output_dir, hedge_delay=-1, progress=None):
+    version_task = asyncio.ensure_future(latest_version(package_name))
+    with staging_dir(output_dir) as workdir:
+        filepath, file_source = await fast_fetch_package_into(package_name, workdir, hedge_delay, progress)
+        return await store_artifact(package_name, filepath, file_source, await version_task)
+
+async def fast_fetch_package_into(package_name, output_dir, hedge_delay=-1, progress=None):
+    """Race the direct links through aria2c, best first"""
+    urls = await direct_links(package_name)
+    if not urls:
+        raise HTTPException(status_code=404, detail="No download links found")
+    candidates = [
+        (f"link {i + 1}", lambda racer_progress, url=url, workdir=output_dir / f"link{i + 1}": aria2c_source(
+            url, workdir, racer_progress
+        ))
+        for i, url in enumerate(urls)
+    ]
+    try:
+        return await race(candidates, hedge_delay, progress)
+    except RaceFailed as e:
+        raise HTTPException(status_code=404, detail=f"No download links found ({e})")
+
+async def aria2c_source(url, output_dir, progress=None):
+    success, filepath, stderr = await run_aria2c(url, output_dir, progress=progress)
+    if not (success and filepath and filepath.exists()):
+        raise RuntimeError(stderr.strip() or "aria2c produced no file")
+    return filepath, "aria2c+fast"
+
 @app.get("/fast-download/{package_name}")
-async def fast_download(package_name: str):
+async def fast_download(package_name: str, request: Request, hedge_delay: float = Query(FAST_DOWNLOAD_HEDGE_DELAY, description="Seconds without data before racing the next link; negative tries them in turn")):
     """Fast download - skips search, uses direct URL pattern"""
     try:
         output_dir = DOWNLOAD_DIR / package_name
-        output_dir.mkdir(exist_ok=True)
-        
-        existing_files = list(output_dir.glob("*.apk")) + list(output_dir.glob("*.xapk"))
-        if existing_files:
-            return FileResponse(
-                path=str(existing_files[0]),
-                filename=existing_files[0].name,
-                media_type="application/vnd.android.package-archive",
-                headers={"X-Source": "cache"}
-            )
-        
-        from scraper import BASE_URL
-        app_url = f"{BASE_URL}/{package_name}/"
-        download_links = get_download_links(app_url)
-        
-        if download_links:
-            for link in download_links:
-                if not link.get('direct'):
-                    continue
-                download_url = link.get('url')
-                if not download_url:
-                    continue
-                
-                success, stdout, stderr = await run_aria2c(download_url, output_dir)
-                if success:
-                    files = sorted(output_dir.glob("*.*"), key=os.path.getmtime, reverse=True)
-                    apk_files = [f for f in files if f.suffix.lower() in ['.apk', '.xapk', '.zip']]
-                    if apk_files:
-                        return FileResponse(
-                            path=str(apk_files[0]),
-                            filename=apk_files[0].name,
-                            media_type="application/vnd.android.package-archive",
-                            headers={"X-Source": "aria2c+fast"}
-                        )
+        artifact = cached_artifact(package_name)
+        if artifact:
+            check_freshness(package_name, artifact)
+            return apk_response(request, artifact, "cache")
         
-        raise HTTPException(status_code=404, detail="No download links found")
+        job = downloads.submit(package_name, fast_fetch_package, package_name, output_dir, hedge_delay)
+        artifact = await downloads.wait(job)
+        return apk_response(request, artifact, artifact["source"])
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def part_layout(size, part_size):
+    """(offset, length) of every fixed-size part of a size-byte file"""
+    return [(offset, min(part_size, size - offset)) for offset in range(0, size, part_size)]
+
+def live_stream(package_name):
+    """The tee of a running streamed download, once its total size is known"""
+    job = downloads.active(package_name)
+    if job is None or job.stream is None or not job.stream.total or job.stream.path is None:
+        return None
+    return job.stream
+
+@app.get("/parts/{package_name}")
+async def list_parts(package_name: str, part_size: int = Query(PART_SIZE, ge=MIN_PART_SIZE)):
+    """Part manifest; parts of a file still being streamed in are listed with ready=false until written"""
+    artifact = artifacts.get(package_name)
+    if artifact is not None:
+        try:
+            digests = await asyncio.to_thread(artifacts.part_digests, artifact, part_size)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Evicted; request /download again")
+        size, filename, sha256, written = artifact["size"], artifact["filename"], artifact["sha256"], artifact["size"]
+    else:
+        tee = live_stream(package_name)
+        if tee is None:
+            raise HTTPException(status_code=404, detail="Not downloaded; request /download first")
+        digests = []
+        size, filename, sha256, written = tee.total, tee.filename, None, tee.written
+    return {
+        "package": package_name,
+        "filename": filename,
+        "size": size,
+        "sha256": sha256,
+        "part_size": part_size,
+        "parts": [
+            {
+                "index": index,
+                "offset": offset,
+                "size": length,
+                "ready": offset + length <= written,
+                "sha256": digests[index] if digests else None,
+                "url": f"/parts/{package_name}/{index}?part_size={part_size}"
+            }
+            for index, (offset, length) in enumerate(part_layout(size, part_size))
+        ]
+    }
+
+@app.get("/parts/{package_name}/{index}")
+async def get_part(package_name: str, index: int, part_size: int = Query(PART_SIZE, ge=MIN_PART_SIZE)):
+    """One part, sent straight from the stored file with its SHA-256 in X-Part-SHA256"""
+    artifact = artifacts.get(package_name)
+    tee = None if artifact is not None else live_stream(package_name)
+    if artifact is None and tee is None:
+        raise HTTPException(status_code=404, detail="Not downloaded; request /download first")
+    
+    size = artifact["size"] if artifact is not None else tee.total
+    layout = part_layout(size, part_size)
+    if not 0 <= index < len(layout):
+        raise HTTPException(status_code=404, detail=f"Part {index} out of range (0-{len(layout) - 1})")
+    offset, length = layout[index]
+    
+    if artifact is not None:
+        try:
+            # The open handle keeps the blob readable even if it is evicted while being sent
+            f = open(artifact["path"], "rb")
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Evicted; request /download again")
+        filename = artifact["filename"]
+        try:
+            digest = (await asyncio.to_thread(artifacts.part_digests, artifact, part_size, f))[index]
+        except Exception:
+            f.close()
+            raise
+        artifacts.touch(package_name)
+    else:
+        f = None
+        if tee.written >= offset + length:
+            try:
+                f = tee.open_reader()
+            except FileNotFoundError:
+                pass  # finished and being moved into the store; ready on the next poll
+        if f is None:
+            return JSONResponse(
+                status_code=202,
+                content={"status": "pending", "written": tee.written, "needed": offset + length},
+                headers={"Retry-After": "2"}
+            )
+        filename = tee.filename
+        try:
+            digest = await asyncio.to_thread(range_sha256, f, offset, length)
+        except Exception:
+            f.close()
+            raise
+    
+    return FilePartResponse(f, offset, length, headers={
+        "Content-Disposition": content_disposition(f"{filename}.part{index + 1:03d}"),
+        "X-Part-Index": str(index),
+        "X-Part-Count": str(len(layout)),
+        "X-Part-Offset": str(offset),
+        "X-Part-SHA256": digest
+    })
+
 @app.get("/games")
 async def list_games(limit: int = Query(20)):
     try:
-        games = scrape_games()
+        games = await scrape_games_async()
         return {"results": games[:limit], "count": len(games[:limit])}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -378,22 +763,39 @@ async def list_games(limit: int = Query(20)):
 @app.get("/apps")
 async def list_apps(limit: int = Query(20)):
     try:
-        apps = scrape_apps()
+        apps = await scrape_apps_async()
         return {"results": apps[:limit], "count": len(apps[:limit])}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = downloads.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
 @app.get("/status/{package_name}")
 async def check_download_status(package_name: str):
-    output_dir = DOWNLOAD_DIR / package_name
-    if output_dir.exists():
-        files = list(output_dir.glob("*.apk")) + list(output_dir.glob("*.xapk"))
-        if files:
-            return {
-                "status": "ready",
-                "file": files[0].name,
-                "size": files[0].stat().st_size
-            }
+    job = downloads.latest(package_name)
+    if job is not None and job.state == "done":
+        job = None
+    artifact = artifacts.get(package_name)
+    if artifact:
+        # Still ready while a background refresh of it runs or fails; that job is reported alongside
+        status = {
+            "status": "ready",
+            "file": artifact["filename"],
+            "size": artifact["size"],
+            "sha256": artifact["sha256"],
+            "source": artifact["source"],
+            "version": artifact["version"]
+        }
+        if job is not None:
+            status["refresh"] = job.to_dict()
+        return status
+    if job is not None:
+        return job.to_dict()
     return {"status": "not_found"}
 
 if __name__ == "__main__":
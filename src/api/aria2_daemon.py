@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+aria2 daemon - one long-running aria2c driven over JSON-RPC (aria2p)
+Every download is queued on the same process, so the number of concurrent
+downloads and the total connection count are enforced in one place and no
+download pays aria2c's startup cost
+"""
+import os
+import time
+import socket
+import asyncio
+import secrets
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import aria2p
+
+RPC_PORT = int(os.environ.get("ARIA2_RPC_PORT", "0"))  # 0 = any free port
+RPC_SECRET = os.environ.get("ARIA2_RPC_SECRET", "")  # empty = a fresh random secret at each start
+MAX_CONCURRENT = int(os.environ.get("ARIA2_MAX_CONCURRENT", "4"))
+MAX_CONNECTIONS = int(os.environ.get("ARIA2_MAX_CONNECTIONS", "64"))  # across every active download
+MAX_DOWNLOAD_LIMIT = os.environ.get("ARIA2_MAX_DOWNLOAD_LIMIT", "0")  # e.g. "20M"; 0 = unlimited
+STARTUP_TIMEOUT = 10.0
+RESTART_BACKOFF = 2.0  # seconds before a crashed daemon may be respawned
+POLL_INTERVAL = 0.5
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+class Aria2Error(Exception):
+    pass
+
+class Aria2Daemon:
+    """Owns the aria2c process; started on first use and restarted after it dies"""
+
+    def __init__(self, port: int = RPC_PORT, secret: str = RPC_SECRET,
+                 max_concurrent: int = MAX_CONCURRENT, max_connections: int = MAX_CONNECTIONS):
+        self.port = port  # the configured port; the one in use is picked at each start when this is 0
+        self.configured_secret = secret
+        self.secret = ""
+        self.max_concurrent = max(1, max_concurrent)
+        # Per-download split so the daemon never opens more than max_connections at once
+        self.split = max(1, min(16, max_connections // self.max_concurrent))
+        self._lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        self._log = None  # the daemon's stderr, on disk so an unread pipe can never fill up and block it
+        self._api: Optional[aria2p.API] = None
+        self._last_start = 0.0
+        self.active: Dict[str, Dict[str, Any]] = {}  # gid -> url, dir, started_at
+        self.completed = 0
+        self.failed = 0
+
+    def _command(self, port: int):
+        return [
+            "aria2c",
+            "--enable-rpc=true",
+            f"--rpc-listen-port={port}",
+            f"--rpc-secret={self.secret}",
+            "--rpc-listen-all=false",
+            f"--max-concurrent-downloads={self.max_concurrent}",
+            f"--max-overall-download-limit={MAX_DOWNLOAD_LIMIT}",
+            f"--max-connection-per-server={self.split}",
+            f"--split={self.split}",
+            "--min-split-size=512K",
+            "--continue=true",
+            "--auto-file-renaming=false",
+            "--allow-overwrite=true",
+            "--file-allocation=none",
+            "--timeout=120",
+            "--connect-timeout=15",
+            "--max-tries=5",
+            "--retry-wait=2",
+            "--enable-http-pipelining=true",
+            "--http-accept-gzip=true",
+            "--stream-piece-selector=geom",
+            "--lowest-speed-limit=50K",
+            "--async-dns=true",
+            "--check-certificate=false",
+            "--max-download-result=1000",
+            f"--user-agent={USER_AGENT}",
+            "--quiet=true",
+        ]
+
+    @staticmethod
+    def _port_open(port: int) -> bool:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    def _log_tail(self) -> str:
+        self._log.seek(0)
+        return self._log.read()[-2000:].decode(errors="ignore").strip()
+
+    def _start(self):
+        if time.time() - self._last_start < RESTART_BACKOFF:
+            raise Aria2Error("aria2 daemon is restarting")
+        self._last_start = time.time()
+        port = self.port or self._free_port()
+        self.secret = self.configured_secret or secrets.token_hex(16)
+        if self._log is not None:
+            self._log.close()
+        self._log = tempfile.TemporaryFile()
+        try:
+            process = subprocess.Popen(self._command(port), stdout=subprocess.DEVNULL, stderr=self._log)
+        except OSError as e:
+            raise Aria2Error(f"aria2c unavailable: {e}")
+
+        deadline = time.time() + STARTUP_TIMEOUT
+        while not self._port_open(port):
+            if process.poll() is not None:
+                raise Aria2Error(f"aria2 daemon exited: {self._log_tail()}")
+            if time.time() > deadline:
+                process.kill()
+                raise Aria2Error("aria2 daemon did not open its RPC port")
+            time.sleep(0.05)
+
+        # Whatever answers must be our process and accept our secret, not something already on the port
+        if process.poll() is not None:
+            raise Aria2Error(f"aria2 daemon exited: {self._log_tail()}")
+        api = aria2p.API(aria2p.Client(host="http://127.0.0.1", port=port, secret=self.secret))
+        try:
+            api.client.get_version()
+        except Exception as e:
+            process.kill()
+            raise Aria2Error(f"RPC port {port} is answered by another process: {e}")
+
+        self._process = process
+        self._api = api
+        self.active.clear()
+        print(f"aria2 daemon started on port {port} (pid {process.pid})")
+
+    def api(self) -> aria2p.API:
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._start()
+            return self._api
+
+    def add(self, url: str, output_dir, filename: Optional[str] = None, referer: Optional[str] = None) -> str:
+        options = {"dir": str(output_dir), "referer": referer or "https://apkdone.com/"}
+        if filename:
+            options["out"] = filename
+        download = self.api().add_uris([url], options=options)
+        self.active[download.gid] = {"url": url, "dir": str(output_dir), "started_at": time.time()}
+        return download.gid
+
+    def status(self, gid: str) -> aria2p.Download:
+        return self.api().get_download(gid)
+
+    def forget(self, gid: str, cancel: bool = False):
+        """Drop a finished (or, with cancel, a running) download from the daemon"""
+        self.active.pop(gid, None)
+        try:
+            client = self.api().client
+            if cancel:
+                client.force_remove(gid)
+            client.remove_download_result(gid)
+        except Exception:
+            pass
+
+    async def download(self, url: str, output_dir, filename: Optional[str] = None,
+                       referer: Optional[str] = None, progress=None):
+        """Queue url on the daemon and wait for it; returns the downloaded file's path"""
+        gid = await asyncio.to_thread(self.add, url, output_dir, filename, referer)
+        finished = False
+        try:
+            while True:
+                await asyncio.sleep(POLL_INTERVAL)
+                download = await asyncio.to_thread(self.status, gid)
+                if progress is not None:
+                    progress.update(download.completed_length, download.total_length, download.download_speed)
+                if download.is_complete:
+                    finished = True
+                    self.completed += 1
+                    return Path(download.files[0].path)
+                if download.has_failed or download.is_removed:
+                    finished = True
+                    self.failed += 1
+                    raise Aria2Error(download.error_message or f"aria2 download {gid} {download.status}")
+        finally:
+            await asyncio.to_thread(self.forget, gid, not finished)
+
+    def stats(self) -> Dict[str, Any]:
+        info = {
+            "running": self._process is not None and self._process.poll() is None,
+            "tracked": len(self.active),
+            "max_concurrent": self.max_concurrent,
+            "split": self.split,
+            "completed": self.completed,
+            "failed": self.failed
+        }
+        if info["running"]:
+            try:
+                stat = self._api.get_stats()
+                info.update({
+                    "download_speed": stat.download_speed,
+                    "num_active": stat.num_active,
+                    "num_waiting": stat.num_waiting
+                })
+            except Exception:
+                pass
+        return info
+
+    def stop(self):
+        with self._lock:
+            if self._process and self._process.poll() is None:
+                self._process.terminate()
+                try:
+                    self._process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+            self._process = None
+            self._api = None
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+_daemon: Optional[Aria2Daemon] = None
+_daemon_lock = threading.Lock()
+
+def get_daemon() -> Aria2Daemon:
+    global _daemon
+    with _daemon_lock:
+        if _daemon is None:
+            _daemon = Aria2Daemon()
+        return _daemon
+
+def shutdown():
+    global _daemon
+    with _daemon_lock:
+        if _daemon is not None:
+            _daemon.stop()
+            _daemon = None
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Artifact Store - content-addressed storage for downloaded APKs
+Files are kept once per SHA-256 under <root>/.store and SQLite maps each
+artifact key (a package name, or "direct:<url>") to a blob together with its
+filename, source and version. Identical APKs fetched for different keys share
+one blob, and the least recently used blobs are evicted once the store
+exceeds its disk quota. Lookups are served from an in-memory copy of the
+table that is loaded once at startup and kept in step with every write.
+"""
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+
+from package_store import thread_connection
+
+DATA_DIR = Path(__file__).parent.parent.parent / "data"
+DB_FILE = DATA_DIR / "artifacts.db"
+STORE_DIRNAME = ".store"
+MAX_BYTES = int(float(os.environ.get("ARTIFACT_STORE_MAX_GB", "20")) * 1024 ** 3)
+HASH_CHUNK = 1024 * 1024
+ARTIFACT_SUFFIXES = ('.apk', '.xapk', '.zip')
+ACCESS_FLUSH_INTERVAL = 30  # seconds between batched last_access writes; the server runs flush_access
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_blobs_last_access ON blobs (last_access);
+CREATE TABLE IF NOT EXISTS artifacts (
+    key TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    sha256 TEXT NOT NULL REFERENCES blobs (sha256),
+    source TEXT NOT NULL DEFAULT '',
+    version TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_sha256 ON artifacts (sha256);
+CREATE TABLE IF NOT EXISTS part_digests (
+    sha256 TEXT NOT NULL,
+    part_size INTEGER NOT NULL,
+    part INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (sha256, part_size, part)
+);
+"""
+
+ARTIFACT_QUERY = """
+SELECT a.key, a.filename, a.sha256, a.source, a.version, a.created_at, a.last_access, b.path, b.size
+FROM artifacts a JOIN blobs b ON b.sha256 = a.sha256
+"""
+
+def file_digests(path, part_size: Optional[int] = None) -> Tuple[str, List[str]]:
+    """SHA-256 of the whole file and, with part_size, of each part_size-byte piece, from one read"""
+    digest = hashlib.sha256()
+    parts = []
+    part, part_left = None, 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+            view = memoryview(chunk) if part_size else memoryview(b'')
+            while view:
+                if part_left == 0:
+                    part, part_left = hashlib.sha256(), part_size
+                    parts.append(part)
+                piece = view[:part_left]
+                part.update(piece)
+                part_left -= len(piece)
+                view = view[len(piece):]
+    return digest.hexdigest(), [part.hexdigest() for part in parts]
+
+def range_sha256(f, offset: int, count: int) -> str:
+    """SHA-256 of count bytes at offset in an open file, without moving its position"""
+    digest = hashlib.sha256()
+    end = offset + count
+    while offset < end:
+        data = os.pread(f.fileno(), min(HASH_CHUNK, end - offset), offset)
+        if not data:
+            break
+        digest.update(data)
+        offset += len(data)
+    return digest.hexdigest()
+
+class ArtifactStore:
+    def __init__(self, root: Path, path: Path = DB_FILE, max_bytes: int = MAX_BYTES, part_size: Optional[int] = None):
+        self.root = Path(root)
+        self.part_size = part_size  # part checksums at this size are computed while ingesting
+        self.blob_dir = self.root / STORE_DIRNAME
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._index: Dict[str, Dict] = {}
+        self._touched = set()
+        self._touched_lock = threading.Lock()
+        self.evictions = 0
+        self.deduplicated = 0
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn().executescript(SCHEMA)
+        self._load_index()
+
+    def _conn(self) -> sqlite3.Connection:
+        return thread_connection(self._local, self.path)
+
+    def _blob_path(self, sha256: str, suffix: str) -> Path:
+        return self.blob_dir / sha256[:2] / (sha256 + suffix.lower())
+
+    @staticmethod
+    def _entry(row) -> Optional[Dict]:
+        artifact = dict(row)
+        try:
+            artifact['mtime'] = os.stat(artifact['path']).st_mtime
+        except OSError:
+            return None
+        return artifact
+
+    def _load_index(self):
+        missing = set()
+        for row in self._conn().execute(ARTIFACT_QUERY).fetchall():
+            artifact = self._entry(row)
+            if artifact is None:
+                missing.add(row['sha256'])
+            else:
+                self._index[artifact['key']] = artifact
+        with self._write_lock:
+            for sha256 in missing:
+                # Blob deleted behind our back; forget it rather than serve a 404 later
+                self._drop_blob(sha256)
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self._index.get(key)
+
+    def touch(self, key: str):
+        """Record a hit in memory only; flush_access writes last_access to SQLite in batches"""
+        artifact = self._index.get(key)
+        if artifact is None:
+            return
+        artifact['last_access'] = time.time()
+        with self._touched_lock:
+            self._touched.add(key)
+
+    def flush_access(self):
+        """Blocking; call it off the event loop"""
+        with self._touched_lock:
+            touched, self._touched = self._touched, set()
+        rows = [(self._index[key]['last_access'], key) for key in touched if key in self._index]
+        if not rows:
+            return
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("UPDATE artifacts SET last_access = ? WHERE key = ?", rows)
+                conn.executemany(
+                    "UPDATE blobs SET last_access = MAX(last_access, ?) "
+                    "WHERE sha256 = (SELECT sha256 FROM artifacts WHERE key = ?)",
+                    rows
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def ingest(self, key: str, file_path, source: str = "", version: str = "", filename: Optional[str] = None,
+               replace: bool = True) -> Dict:
+        """
+        Move a completed download into the store and point key at it; the source
+        file is consumed. With replace=False an existing key wins and the file is
+        just deleted. Blocking (hashes the whole file), so call it off the event loop.
+        """
+        file_path = Path(file_path)
+        filename = filename or file_path.name
+        sha256, parts = file_digests(file_path, self.part_size)
+        size = file_path.stat().st_size
+        blob_path = self._blob_path(sha256, file_path.suffix)
+        now = time.time()
+
+        with self._write_lock:
+            if not replace and key in self._index:
+                file_path.unlink()
+                return self._index[key]
+            conn = self._conn()
+            existing = conn.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            if existing is not None and os.path.exists(existing['path']):
+                file_path.unlink()
+                blob_path = Path(existing['path'])
+                self.deduplicated += 1
+            else:
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(file_path), str(blob_path))  # a rename when staging is on the same disk
+
+            previous = conn.execute("SELECT sha256 FROM artifacts WHERE key = ?", (key,)).fetchone()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO blobs (sha256, path, size, created_at, last_access) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(sha256) DO UPDATE SET path = excluded.path, last_access = excluded.last_access",
+                    (sha256, str(blob_path), size, now, now)
+                )
+                conn.execute(
+                    "INSERT INTO artifacts (key, filename, sha256, source, version, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET filename = excluded.filename, sha256 = excluded.sha256, "
+                    "source = excluded.source, version = excluded.version, created_at = excluded.created_at, "
+                    "last_access = excluded.last_access",
+                    (key, filename, sha256, source or '', version or '', now, now)
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO part_digests (sha256, part_size, part, digest) VALUES (?, ?, ?, ?)",
+                    [(sha256, self.part_size, index, digest) for index, digest in enumerate(parts)]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            row = conn.execute(ARTIFACT_QUERY + " WHERE a.key = ?", (key,)).fetchone()
+            self._index[key] = self._entry(row)
+            if previous is not None and previous['sha256'] != sha256:
+                self._drop_if_unreferenced(previous['sha256'])
+
+        self.evict(keep=sha256)
+        return self.get(key)
+
+    def remove(self, key: str):
+        with self._write_lock:
+            row = self._conn().execute("SELECT sha256 FROM artifacts WHERE key = ?", (key,)).fetchone()
+            self._conn().execute("DELETE FROM artifacts WHERE key = ?", (key,))
+            self._index.pop(key, None)
+            if row is not None:
+                self._drop_if_unreferenced(row['sha256'])
+
+    def _drop_if_unreferenced(self, sha256: str):
+        if self._conn().execute("SELECT 1 FROM artifacts WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone() is None:
+            self._drop_blob(sha256)
+
+    def _drop_blob(self, sha256: str):
+        conn = self._conn()
+        row = conn.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        conn.execute("DELETE FROM artifacts WHERE sha256 = ?", (sha256,))
+        conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+        conn.execute("DELETE FROM part_digests WHERE sha256 = ?", (sha256,))
+        for key in [key for key, artifact in self._index.items() if artifact['sha256'] == sha256]:
+            del self._index[key]
+        if row is not None:
+            Path(row['path']).unlink(missing_ok=True)
+
+    def part_digests(self, artifact: Dict, part_size: int, f=None) -> List[str]:
+        """
+        Checksum of every part_size-byte part. Sizes other than the store's own are
+        computed in one pass (over f if given, else the blob) the first time they
+        are asked for, then remembered. Blocking; raises FileNotFoundError if the
+        blob has been evicted and no open f was passed.
+        """
+        sha256 = artifact['sha256']
+        count = -(-artifact['size'] // part_size)
+        rows = self._conn().execute(
+            "SELECT digest FROM part_digests WHERE sha256 = ? AND part_size = ? ORDER BY part", (sha256, part_size)
+        ).fetchall()
+        if len(rows) == count:
+            return [row['digest'] for row in rows]
+        with (open(artifact['path'], 'rb') if f is None else nullcontext(f)) as blob:
+            digests = [
+                range_sha256(blob, offset, min(part_size, artifact['size'] - offset))
+                for offset in range(0, artifact['size'], part_size)
+            ]
+        with self._write_lock:
+            if self._conn().execute("SELECT 1 FROM blobs WHERE sha256 = ?", (sha256,)).fetchone() is not None:
+                self._conn().executemany(
+                    "INSERT OR REPLACE INTO part_digests (sha256, part_size, part, digest) VALUES (?, ?, ?, ?)",
+                    [(sha256, part_size, index, digest) for index, digest in enumerate(digests)]
+                )
+        return digests
+
+    def total_bytes(self) -> int:
+        return self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def evict(self, max_bytes: Optional[int] = None, keep: Optional[str] = None) -> int:
+        """Delete least recently used blobs (and every key pointing at them) until under quota; `keep` is spared"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        freed = 0
+        self.flush_access()
+        with self._write_lock:
+            total = self.total_bytes()
+            if total <= max_bytes:
+                return 0
+            rows = self._conn().execute("SELECT sha256, size FROM blobs ORDER BY last_access").fetchall()
+            for row in rows:
+                if total <= max_bytes:
+                    break
+                if row['sha256'] == keep:
+                    continue
+                self._drop_blob(row['sha256'])
+                total -= row['size']
+                freed += row['size']
+                self.evictions += 1
+        if freed:
+            print(f"Artifact store evicted {freed} bytes")
+        return freed
+
+    def import_legacy(self) -> int:
+        """
+        Adopt APKs left in <root>/<package>/ by older versions of the server. Runs
+        while the server is live, so a key that already has an artifact keeps it.
+        <root>/direct/ is skipped: those files were saved without their URL, which
+        is what direct downloads are keyed by, so they could never be served.
+        """
+        imported = 0
+        for package_dir in self.root.iterdir():
+            if not package_dir.is_dir() or package_dir.name.startswith('.') or package_dir.name == "direct":
+                continue
+            for path in package_dir.iterdir():
+                if not path.is_file() or path.suffix.lower() not in ARTIFACT_SUFFIXES:
+                    continue
+                try:
+                    if self.ingest(package_dir.name, path, source="legacy", replace=False)['source'] == "legacy":
+                        imported += 1
+                except OSError as e:
+                    print(f"Legacy artifact import failed for {path}: {e}")
+        return imported
+
+    def stats(self) -> Dict:
+        conn = self._conn()
+        blobs, blob_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        artifacts, logical_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM artifacts a JOIN blobs b ON b.sha256 = a.sha256"
+        ).fetchone()
+        return {
+            "artifacts": artifacts,
+            "blobs": blobs,
+            "bytes": blob_bytes,
+            "max_bytes": self.max_bytes,
+            "bytes_saved_by_dedup": logical_bytes - blob_bytes,
+            "deduplicated": self.deduplicated,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Per-package download coordination
+Downloads run as jobs on a fixed pool of workers. The first request for a
+package queues its job; any request arriving while it is queued or running
+waits on the same job (or is handed its id to poll). Every job writes into a
+private staging directory and only a finished file leaves it, so nothing
+ever serves a half-written download.
+"""
+import os
+import time
+import uuid
+import shutil
+import asyncio
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+STAGING_PREFIX = ".partial-"
+RESUME_DIRNAME = ".resume"  # partial range downloads kept across jobs, keyed by URL
+RESUME_MAX_AGE = 24 * 3600
+MAX_CONCURRENT_DOWNLOADS = int(os.environ.get("DOWNLOAD_WORKERS", "4"))
+
+@contextmanager
+def staging_dir(output_dir):
+    """A fresh hidden directory under output_dir, removed with whatever is left in it"""
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    path = Path(tempfile.mkdtemp(prefix=STAGING_PREFIX, dir=output_dir))
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+def clean_staging(root):
+    """Remove staging directories left behind by a crash or restart"""
+    removed = 0
+    for path in Path(root).glob(f"*/{STAGING_PREFIX}*"):
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    return removed
+
+def clean_resume(root, max_age=RESUME_MAX_AGE):
+    """Remove partial downloads nobody has resumed for max_age seconds"""
+    removed = 0
+    cutoff = time.time() - max_age
+    for path in (Path(root) / RESUME_DIRNAME).glob("*"):
+        try:
+            if max(entry.stat().st_mtime for entry in [path, *path.iterdir()]) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+class DownloadProgress:
+    """Byte counters a downloader updates as it goes; speed is derived when the tool doesn't report it"""
+
+    def __init__(self):
+        self.downloaded = 0
+        self.total = 0
+        self.speed = 0.0
+        self.updated_at: Optional[float] = None
+
+    def update(self, downloaded: int, total: int = 0, speed: Optional[float] = None):
+        now = time.monotonic()
+        if speed is None and self.updated_at is not None and now > self.updated_at:
+            instant = max(0, downloaded - self.downloaded) / (now - self.updated_at)
+            speed = instant if not self.speed else 0.7 * self.speed + 0.3 * instant
+        self.downloaded = downloaded
+        if total:
+            self.total = total
+        if speed is not None:
+            self.speed = speed
+        self.updated_at = now
+
+    @property
+    def eta(self) -> Optional[float]:
+        if not self.total or not self.speed:
+            return None
+        return max(0, self.total - self.downloaded) / self.speed
+
+    def to_dict(self) -> Dict[str, Any]:
+        eta = self.eta
+        return {
+            "downloaded": self.downloaded,
+            "total": self.total,
+            "percent": round(self.downloaded * 100 / self.total, 1) if self.total else None,
+            "speed": int(self.speed),
+            "eta": round(eta, 1) if eta is not None else None
+        }
+
+class DownloadJob:
+    def __init__(self, package: str, func: Callable[..., Awaitable[Any]], args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.package = package
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.state = "queued"
+        self.progress = DownloadProgress()
+        self.stream: Optional[Any] = None  # a TeeDownload followers can tail while the job runs
+        self.result: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    async def run(self):
+        self.state = "running"
+        self.started_at = time.time()
+        try:
+            value = await self.func(*self.args, progress=self.progress, **self.kwargs)
+        except asyncio.CancelledError:
+            self.state = "failed"
+            self.error = "cancelled"
+            self.result.cancel()
+            raise
+        except Exception as e:
+            self.state = "failed"
+            self.error = getattr(e, "detail", None) or str(e)
+            self.result.set_exception(e)
+            self.result.exception()  # mark retrieved even if nobody is waiting
+        else:
+            self.state = "done"
+            self.result.set_result(value)
+        finally:
+            self.finished_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        info = {
+            "job_id": self.id,
+            "package": self.package,
+            "status": self.state,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress.to_dict()
+        }
+        if self.error:
+            info["error"] = self.error
+        return info
+
+class DownloadCoordinator:
+    def __init__(self, concurrency: int = MAX_CONCURRENT_DOWNLOADS, keep_finished: int = 256):
+        self.concurrency = max(1, concurrency)
+        self.keep_finished = keep_finished
+        self._active: Dict[str, DownloadJob] = {}
+        self._jobs: Dict[str, DownloadJob] = {}
+        self._latest: Dict[str, DownloadJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self.started = 0
+        self.joined = 0
+
+    def _ensure_workers(self):
+        # Created lazily so the queue and tasks belong to the server's event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._workers = [
+                asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)
+            ]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await job.run()
+            finally:
+                self._finished(job)
+                self._queue.task_done()
+
+    def _finished(self, job: DownloadJob):
+        if self._active.get(job.package) is job:
+            del self._active[job.package]
+        finished = [j for j in self._jobs.values() if j.finished_at is not None]
+        for old in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[old.id]
+            if self._latest.get(old.package) is old:
+                del self._latest[old.package]
+
+    def active(self, package: str) -> Optional[DownloadJob]:
+        return self._active.get(package)
+
+    def latest(self, package: str) -> Optional[DownloadJob]:
+        """The running job for package, else the last one that finished"""
+        return self._latest.get(package)
+
+    def get(self, job_id: str) -> Optional[DownloadJob]:
+        return self._jobs.get(job_id)
+
+    def submit(self, package: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> DownloadJob:
+        """
+        Queue a job for package, or return the one already queued/running for it;
+        func is called with a `progress` keyword it should keep updated
+        """
+        job = self._active.get(package)
+        if job is not None:
+            self.joined += 1
+            return job
+        self._ensure_workers()
+        job = DownloadJob(package, func, args, kwargs)
+        self._active[package] = job
+        self._jobs[job.id] = job
+        self._latest[package] = job
+        self._queue.put_nowait(job)
+        self.started += 1
+        return job
+
+    async def wait(self, job: DownloadJob) -> Any:
+        # A caller that disconnects must not cancel the download others are waiting on
+        return await asyncio.shield(job.result)
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def stats(self) -> Dict[str, int]:
+        states = [job.state for job in self._active.values()]
+        return {
+            "concurrency": self.concurrency,
+            "queued": states.count("queued"),
+            "running": states.count("running"),
+            "started": self.started,
+            "joined": self.joined
+        }
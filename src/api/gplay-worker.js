@@ -0,0 +1,60 @@
+import readline from 'readline';
+import gplay from 'google-play-scraper';
+
+// Long-lived google-play-scraper worker driven by src/api/gplay_sidecar.py.
+// Reads one JSON request per line ({id, method, params}) from stdin and writes
+// one JSON response per line ({id, result} or {id, error}) to stdout.
+
+const MAX_CONCURRENCY = parseInt(process.env.GPLAY_WORKER_CONCURRENCY || '8', 10);
+const DEFAULTS = { lang: 'en', country: 'us' };
+
+const METHODS = {
+    search: (params) => gplay.search({ ...DEFAULTS, ...params }),
+    app: (params) => gplay.app({ ...DEFAULTS, ...params })
+};
+
+const queue = [];
+let active = 0;
+
+function send(message) {
+    process.stdout.write(JSON.stringify(message) + '\n');
+}
+
+async function handle(request) {
+    active++;
+    try {
+        const method = METHODS[request.method];
+        if (!method) {
+            throw new Error(`Unknown method: ${request.method}`);
+        }
+        const result = await method(request.params || {});
+        send({ id: request.id, result });
+    } catch (err) {
+        send({ id: request.id, error: err.message || String(err) });
+    } finally {
+        active--;
+        if (queue.length > 0) {
+            handle(queue.shift());
+        }
+    }
+}
+
+const rl = readline.createInterface({ input: process.stdin });
+
+rl.on('line', (line) => {
+    if (!line.trim()) return;
+    let request;
+    try {
+        request = JSON.parse(line);
+    } catch (err) {
+        console.error(`[gplay-worker] Bad request: ${err.message}`);
+        return;
+    }
+    if (active < MAX_CONCURRENCY) {
+        handle(request);
+    } else {
+        queue.push(request);
+    }
+});
+
+rl.on('close', () => process.exit(0));
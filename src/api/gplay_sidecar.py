@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Google Play Sidecar - long-lived Node workers running google-play-scraper
+Requests are multiplexed over each worker's stdin/stdout as JSON lines with ids,
+so the Node startup cost is paid once instead of once per lookup
+"""
+import os
+import json
+import time
+import asyncio
+import itertools
+import threading
+import subprocess
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+ROOT_DIR = Path(__file__).parent.parent.parent
+WORKER_SCRIPT = Path(__file__).parent / "gplay-worker.js"
+
+POOL_SIZE = int(os.environ.get("GPLAY_WORKERS", "2"))
+WORKER_CONCURRENCY = int(os.environ.get("GPLAY_WORKER_CONCURRENCY", "8"))
+RESTART_BACKOFF = 2.0  # seconds before a crashed worker may be respawned
+
+class SidecarError(Exception):
+    pass
+
+class GooglePlayWorker:
+    """One Node process; restarted on the next request after it dies"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._process = None
+        self._pending: Dict[int, Future] = {}
+        self._ids = itertools.count(1)
+        self._last_start = 0.0
+
+    @property
+    def load(self) -> int:
+        return len(self._pending)
+
+    def _start(self):
+        if time.time() - self._last_start < RESTART_BACKOFF:
+            raise SidecarError("Google Play worker is restarting")
+        self._last_start = time.time()
+        process = subprocess.Popen(
+            ['node', str(WORKER_SCRIPT)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            cwd=str(ROOT_DIR),
+            env={**os.environ, 'GPLAY_WORKER_CONCURRENCY': str(WORKER_CONCURRENCY)}
+        )
+        pending = {}
+        self._process = process
+        self._pending = pending
+        threading.Thread(target=self._read_loop, args=(process, pending), daemon=True).start()
+
+    def _read_loop(self, process, pending):
+        for line in process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            future = pending.pop(message.get('id'), None)
+            if future is None or future.done():
+                continue
+            if 'error' in message:
+                future.set_exception(SidecarError(message['error']))
+            else:
+                future.set_result(message.get('result'))
+
+        process.wait()
+        print(f"Google Play worker exited with code {process.returncode}")
+        for future in list(pending.values()):
+            if not future.done():
+                future.set_exception(SidecarError("Google Play worker died"))
+        pending.clear()
+
+    def submit(self, method: str, params: Dict[str, Any]) -> Future:
+        future = Future()
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._start()
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+            try:
+                self._process.stdin.write(json.dumps({'id': request_id, 'method': method, 'params': params}) + '\n')
+                self._process.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                self._pending.pop(request_id, None)
+                future.set_exception(SidecarError(f"Google Play worker unavailable: {e}"))
+        future.request_id = request_id
+        return future
+
+    def discard(self, future: Future):
+        self._pending.pop(getattr(future, 'request_id', None), None)
+
+    def stop(self):
+        with self._lock:
+            if self._process and self._process.poll() is None:
+                try:
+                    self._process.stdin.close()
+                    self._process.wait(timeout=5)
+                except Exception:
+                    self._process.kill()
+            self._process = None
+
+class GooglePlayPool:
+    """Small pool of workers; each request goes to the least busy one"""
+
+    def __init__(self, size: int = POOL_SIZE):
+        self.workers = [GooglePlayWorker() for _ in range(max(1, size))]
+
+    def _pick(self) -> GooglePlayWorker:
+        return min(self.workers, key=lambda w: w.load)
+
+    def request(self, method: str, params: Dict[str, Any], timeout: float = 30) -> Any:
+        worker = self._pick()
+        future = worker.submit(method, params)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            worker.discard(future)
+            raise
+
+    async def request_async(self, method: str, params: Dict[str, Any], timeout: float = 30) -> Any:
+        worker = self._pick()
+        future = worker.submit(method, params)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            worker.discard(future)
+            raise
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+
+_pool: Optional[GooglePlayPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> GooglePlayPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = GooglePlayPool()
+        return _pool
+
+def gplay_request(method: str, params: Dict[str, Any], timeout: float = 30) -> Any:
+    return get_pool().request(method, params, timeout)
+
+async def gplay_request_async(method: str, params: Dict[str, Any], timeout: float = 30) -> Any:
+    return await get_pool().request_async(method, params, timeout)
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.stop()
+            _pool = None
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Package Store - SQLite-backed slug -> package name cache
+WAL mode keeps the file consistent when several uvicorn workers share it
+"""
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Iterable
+
+DATA_DIR = Path(__file__).parent.parent.parent / "data"
+DB_FILE = DATA_DIR / "package_cache.db"
+LEGACY_JSON_FILE = DATA_DIR / "package_cache.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS packages (
+    slug TEXT PRIMARY KEY,
+    package TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    icon TEXT NOT NULL DEFAULT '',
+    source TEXT NOT NULL DEFAULT 'google',
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_packages_timestamp ON packages (timestamp);
+"""
+
+UPSERT = """
+INSERT INTO packages (slug, package, title, icon, source, timestamp)
+VALUES (:slug, :package, :title, :icon, :source, :timestamp)
+ON CONFLICT(slug) DO UPDATE SET
+    package = excluded.package,
+    title = excluded.title,
+    icon = excluded.icon,
+    source = excluded.source,
+    timestamp = excluded.timestamp
+"""
+
+def thread_connection(local: threading.local, path: Path) -> sqlite3.Connection:
+    """The calling thread's WAL connection to path, opened on first use"""
+    # sqlite3 connections can't be shared across threads; keep one per thread
+    conn = getattr(local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(str(path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        local.conn = conn
+    return conn
+
+class PackageStore:
+    def __init__(self, path: Path = DB_FILE, legacy_json: Optional[Path] = LEGACY_JSON_FILE):
+        self.path = Path(path)
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        if legacy_json is not None:
+            self._import_legacy_json(Path(legacy_json))
+
+    def _conn(self) -> sqlite3.Connection:
+        return thread_connection(self._local, self.path)
+
+    def _import_legacy_json(self, json_file: Path):
+        """One-time migration from the old whole-file JSON cache"""
+        if not json_file.exists():
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM packages LIMIT 1").fetchone() is None:
+                with open(json_file, 'r') as f:
+                    data = json.load(f)
+                conn.executemany(UPSERT, [
+                    self._row(slug, entry.get('package', ''), entry.get('title', ''),
+                              entry.get('icon', ''), entry.get('source', 'google'),
+                              entry.get('timestamp', 0))
+                    for slug, entry in data.items() if entry.get('package')
+                ])
+            conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            print(f"Legacy package cache import failed: {e}")
+
+    @staticmethod
+    def _row(slug: str, package: str, title: str = "", icon: str = "", source: str = "google",
+             timestamp: Optional[float] = None) -> Dict:
+        return {
+            'slug': slug.lower(),
+            'package': package,
+            'title': title or '',
+            'icon': icon or '',
+            'source': source or 'google',
+            'timestamp': time.time() if timestamp is None else timestamp
+        }
+
+    def get(self, slug: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT package, title, icon, source, timestamp FROM packages WHERE slug = ?",
+            (slug.lower(),)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def put(self, slug: str, package: str, title: str = "", icon: str = "", source: str = "google"):
+        self.put_many([self._row(slug, package, title, icon, source)])
+
+    def put_many(self, rows: Iterable[Dict]):
+        """Upsert many entries in a single transaction"""
+        rows = [self._row(**row) for row in rows]
+        if not rows:
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(UPSERT, rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def purge_expired(self, ttl: float) -> int:
+        cursor = self._conn().execute("DELETE FROM packages WHERE timestamp < ?", (time.time() - ttl,))
+        return cursor.rowcount
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM packages").fetchone()[0]
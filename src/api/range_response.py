@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Resumable file responses
+Serves stored artifacts with a strong ETag (the content hash), honours
+If-None-Match, Range (single and multiple byte ranges) and If-Range, so an
+interrupted transfer can resume and a client can fetch pieces in parallel.
+FilePartResponse sends one slice of an open file, with sendfile when the
+server implements the ASGI zero-copy send extension.
+"""
+import os
+import asyncio
+import secrets
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 256 * 1024
+MAX_RANGES = 16  # more than this in one request is treated as abuse and answered with the whole file
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+def content_disposition(filename: str) -> str:
+    """
+    attachment header for filename, quoted the way Starlette's FileResponse does;
+    names that need it get an RFC 6266 filename* plus a plain ASCII fallback
+    """
+    quoted = quote(filename)
+    if quoted == filename:
+        return f'attachment; filename="{filename}"'
+    fallback = "".join(c if " " <= c <= "~" and c not in '"\\' else "_" for c in filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=utf-8''{quoted}"
+
+def parse_range(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Inclusive (start, end) pairs for a `bytes=` Range header, sorted and merged;
+    None when the header should be ignored (wrong unit, malformed, too many ranges)
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+    ranges = []
+    for part in spec.split(","):
+        start, sep, end = part.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if start:
+                first = int(start)
+                last = int(end) if end else size - 1
+            else:
+                suffix = int(end)
+                if suffix == 0:
+                    continue
+                first, last = max(0, size - suffix), size - 1
+        except ValueError:
+            return None
+        if first > last and start and end:
+            return None
+        if first < size:
+            ranges.append((first, min(last, size - 1)))
+    if not ranges:
+        raise RangeNotSatisfiable()
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for first, last in ranges[1:]:
+        if first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+async def _read_range(path: str, first: int, last: int):
+    with open(path, "rb") as f:
+        offset = first
+        while offset <= last:
+            data = await asyncio.to_thread(os.pread, f.fileno(), min(CHUNK_SIZE, last - offset + 1), offset)
+            if not data:
+                break
+            offset += len(data)
+            yield data
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def file_response(request: Request, path: str, filename: str, size: int, etag_value: str,
+                  media_type: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    etag = f'"{etag_value}"'
+    headers = {**(headers or {}), "ETag": etag, "Accept-Ranges": "bytes"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = content_disposition(filename)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            ranges = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if ranges:
+            return _partial_response(path, size, ranges, media_type, headers)
+
+    return WholeFileResponse(path=path, filename=filename, media_type=media_type, headers=headers)
+
+class WholeFileResponse(FileResponse):
+    """
+    FileResponse that always sends the whole file. Starlette's FileResponse
+    parses Range itself; by the time this is used file_response has already
+    decided the header is to be ignored (malformed, other unit, too many ranges).
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        headers = [(name, value) for name, value in scope["headers"] if name not in (b"range", b"if-range")]
+        await super().__call__({**scope, "headers": headers}, receive, send)
+
+def _partial_response(path: str, size: int, ranges: List[Tuple[int, int]],
+                      media_type: str, headers: Dict[str, str]) -> Response:
+    if len(ranges) == 1:
+        first, last = ranges[0]
+        headers.update({"Content-Range": f"bytes {first}-{last}/{size}", "Content-Length": str(last - first + 1)})
+        return StreamingResponse(_read_range(path, first, last), status_code=206, media_type=media_type, headers=headers)
+
+    boundary = secrets.token_hex(16)
+    part_headers = [
+        f"--{boundary}\r\nContent-Type: {media_type}\r\nContent-Range: bytes {first}-{last}/{size}\r\n\r\n".encode()
+        for first, last in ranges
+    ]
+    closing = f"--{boundary}--\r\n".encode()
+    length = sum(len(head) + (last - first + 1) + 2 for head, (first, last) in zip(part_headers, ranges)) + len(closing)
+
+    async def body():
+        for head, (first, last) in zip(part_headers, ranges):
+            yield head
+            async for data in _read_range(path, first, last):
+                yield data
+            yield b"\r\n"
+        yield closing
+
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        body(), status_code=206, media_type=f"multipart/byteranges; boundary={boundary}", headers=headers
+    )
+
+class FilePartResponse(Response):
+    """
+    count bytes at offset of an open file. Uses the http.response.zerocopysend
+    extension (sendfile from the stored file) when the ASGI server offers it,
+    otherwise reads the slice in chunks. The file is closed once sent.
+    """
+
+    def __init__(self, file, offset: int, count: int, status_code: int = 200,
+                 headers: Optional[Dict[str, str]] = None, media_type: str = "application/octet-stream"):
+        self.file = file
+        self.offset = offset
+        self.count = count
+        super().__init__(
+            status_code=status_code,
+            headers={**(headers or {}), "Content-Length": str(count)},
+            media_type=media_type
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": self.file,
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False
+                })
+                return
+            offset, end = self.offset, self.offset + self.count
+            while offset < end:
+                data = await asyncio.to_thread(os.pread, self.file.fileno(), min(CHUNK_SIZE, end - offset), offset)
+                if not data:
+                    break
+                offset += len(data)
+                await send({"type": "http.response.body", "body": data, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            self.file.close()
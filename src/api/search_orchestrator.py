@@ -6,108 +6,148 @@ Combines apkdone (primary) with Google Play Scraper (fallback)
 import os
 import sys
 import re
-import json
 import time
-import subprocess
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, Dict, List, Any
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from gplay_sidecar import gplay_request, gplay_request_async
+from package_store import PackageStore
+from ttl_cache import TTLCache, start_sweeper
 
-CACHE_FILE = Path(__file__).parent.parent.parent / "data" / "package_cache.json"
 CACHE_TTL = 86400  # 24 hours
+MEMORY_CACHE_SIZE = int(os.environ.get("PACKAGE_MEMORY_CACHE_SIZE", "5000"))
+CACHE_SWEEP_INTERVAL = 600  # seconds between expiry sweeps of memory and disk
+VERSION_CACHE_TTL = int(os.environ.get("VERSION_CACHE_TTL", "1800"))  # how often a package's upstream version is rechecked
+UNKNOWN_VERSIONS = {'', 'varies with device'}
 
-_package_cache = {}
-_cache_loaded = False
+# Per-source deadlines for combined_search, measured from when both start
+APKDONE_DEADLINE = float(os.environ.get("APKDONE_SEARCH_DEADLINE", "20"))
+GOOGLE_DEADLINE = float(os.environ.get("GOOGLE_SEARCH_DEADLINE", "12"))
 
-def load_cache():
-    global _package_cache, _cache_loaded
-    if _cache_loaded:
-        return
-    try:
-        CACHE_FILE.parent.mkdir(exist_ok=True)
-        if CACHE_FILE.exists():
-            with open(CACHE_FILE, 'r') as f:
-                _package_cache = json.load(f)
-    except:
-        _package_cache = {}
-    _cache_loaded = True
-
-def save_cache():
-    try:
-        CACHE_FILE.parent.mkdir(exist_ok=True)
-        with open(CACHE_FILE, 'w') as f:
-            json.dump(_package_cache, f, indent=2)
-    except Exception as e:
-        print(f"Cache save failed: {e}")
+_search_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="search")
+_background_tasks = set()
+
+_store = None
+_memory_cache = TTLCache(maxsize=MEMORY_CACHE_SIZE, ttl=CACHE_TTL)
+_version_cache = TTLCache(maxsize=MEMORY_CACHE_SIZE, ttl=VERSION_CACHE_TTL)
+_store_lock = threading.Lock()
+
+def _sweep_store():
+    removed = get_store().purge_expired(CACHE_TTL)
+    if removed:
+        print(f"Purged {removed} expired package cache entries")
+
+def get_store() -> PackageStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PackageStore()
+            start_sweeper(CACHE_SWEEP_INTERVAL, _memory_cache.sweep, _version_cache.sweep, _sweep_store)
+        return _store
+
+def _remember(slug: str, entry: Dict):
+    remaining = CACHE_TTL - (time.time() - entry.get('timestamp', 0))
+    _memory_cache.set(slug.lower(), entry, ttl=remaining)
 
 def get_cached_package(slug: str) -> Optional[Dict]:
-    load_cache()
-    entry = _package_cache.get(slug.lower())
+    entry = _memory_cache.get(slug.lower())
+    if entry:
+        return entry
+    try:
+        entry = get_store().get(slug)
+    except Exception as e:
+        print(f"Cache read failed: {e}")
+        return None
     if entry and (time.time() - entry.get('timestamp', 0)) < CACHE_TTL:
+        _remember(slug, entry)
         return entry
     return None
 
 def cache_package(slug: str, package_name: str, title: str, icon: str = "", source: str = "google"):
-    load_cache()
-    _package_cache[slug.lower()] = {
-        'package': package_name,
-        'title': title,
-        'icon': icon,
-        'source': source,
-        'timestamp': time.time()
-    }
-    save_cache()
+    cache_packages([{'slug': slug, 'package': package_name, 'title': title, 'icon': icon, 'source': source}])
+
+def cache_packages(entries: List[Dict]):
+    """Batch insert: one transaction for the whole list"""
+    entries = [entry for entry in entries if entry.get('slug') and entry.get('package')]
+    now = time.time()
+    for entry in entries:
+        _remember(entry['slug'], {
+            'package': entry['package'],
+            'title': entry.get('title', ''),
+            'icon': entry.get('icon', ''),
+            'source': entry.get('source', 'google'),
+            'timestamp': now
+        })
+    try:
+        get_store().put_many(entries)
+    except Exception as e:
+        print(f"Cache save failed: {e}")
+
+def cache_stats() -> Dict[str, Any]:
+    return _memory_cache.stats()
 
 def is_package_name(name: str) -> bool:
     """Check if string looks like a package name (com.xxx.xxx)"""
     return bool(re.match(r'^[a-z][a-z0-9_]*(\.[a-z][a-z0-9_]*)+$', name.lower()))
 
+def _format_search_results(data: Any, num: int) -> List[Dict]:
+    apps = []
+    if isinstance(data, list):
+        for app in data[:num]:
+            apps.append({
+                'name': app.get('title', ''),
+                'package': app.get('appId', ''),
+                'appId': app.get('appId', ''),
+                'version': '',
+                'size': app.get('size', ''),
+                'icon': app.get('icon', ''),
+                'image': app.get('icon', ''),
+                'developer': app.get('developer', ''),
+                'score': app.get('score', 0),
+                'url': f"https://play.google.com/store/apps/details?id={app.get('appId', '')}",
+                'source': 'google',
+                'category': app.get('genre', '')
+            })
+    return apps
+
+def _format_app(app: Any) -> Optional[Dict]:
+    if not isinstance(app, dict):
+        return None
+    return {
+        'name': app.get('title', ''),
+        'package': app.get('appId', ''),
+        'appId': app.get('appId', ''),
+        'version': app.get('version', ''),
+        'size': app.get('size', ''),
+        'icon': app.get('icon', ''),
+        'developer': app.get('developer', ''),
+        'description': app.get('summary', ''),
+        'score': app.get('score', 0),
+        'url': app.get('url', ''),
+        'source': 'google',
+        'category': app.get('genre', '')
+    }
+
 def search_google_play(query: str, num: int = 10) -> List[Dict]:
-    """Search Google Play Store using google-play-scraper npm package"""
+    """Search Google Play Store through the google-play-scraper sidecar"""
+    try:
+        data = gplay_request('search', {'term': query, 'num': num}, timeout=30)
+        return _format_search_results(data, num)
+    except TimeoutError:
+        print("Google Play search timeout")
+    except Exception as e:
+        print(f"Google Play search error: {e}")
+    return []
+
+async def search_google_play_async(query: str, num: int = 10) -> List[Dict]:
     try:
-        script = f"""
-        const gplay = require('google-play-scraper').default || require('google-play-scraper');
-        gplay.search({{
-            term: {json.dumps(query)},
-            num: {num},
-            lang: 'en',
-            country: 'us'
-        }}).then(results => {{
-            console.log(JSON.stringify(results));
-        }}).catch(err => {{
-            console.error(JSON.stringify({{error: err.message}}));
-        }});
-        """
-        result = subprocess.run(
-            ['node', '-e', script],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            cwd=str(Path(__file__).parent.parent.parent)
-        )
-        
-        if result.returncode == 0 and result.stdout.strip():
-            data = json.loads(result.stdout.strip())
-            if isinstance(data, list):
-                apps = []
-                for app in data[:num]:
-                    apps.append({
-                        'name': app.get('title', ''),
-                        'package': app.get('appId', ''),
-                        'appId': app.get('appId', ''),
-                        'version': '',
-                        'size': app.get('size', ''),
-                        'icon': app.get('icon', ''),
-                        'image': app.get('icon', ''),
-                        'developer': app.get('developer', ''),
-                        'score': app.get('score', 0),
-                        'url': f"https://play.google.com/store/apps/details?id={app.get('appId', '')}",
-                        'source': 'google',
-                        'category': app.get('genre', '')
-                    })
-                return apps
-    except subprocess.TimeoutExpired:
+        data = await gplay_request_async('search', {'term': query, 'num': num}, timeout=30)
+        return _format_search_results(data, num)
+    except TimeoutError:
         print("Google Play search timeout")
     except Exception as e:
         print(f"Google Play search error: {e}")
@@ -116,106 +156,179 @@ def search_google_play(query: str, num: int = 10) -> List[Dict]:
 def get_google_play_app(package_name: str) -> Optional[Dict]:
     """Get app details from Google Play Store"""
     try:
-        script = f"""
-        const gplay = require('google-play-scraper').default || require('google-play-scraper');
-        gplay.app({{
-            appId: {json.dumps(package_name)},
-            lang: 'en',
-            country: 'us'
-        }}).then(app => {{
-            console.log(JSON.stringify(app));
-        }}).catch(err => {{
-            console.error(JSON.stringify({{error: err.message}}));
-        }});
-        """
-        result = subprocess.run(
-            ['node', '-e', script],
-            capture_output=True,
-            text=True,
-            timeout=15,
-            cwd=str(Path(__file__).parent.parent.parent)
-        )
-        
-        if result.returncode == 0 and result.stdout.strip():
-            app = json.loads(result.stdout.strip())
-            if 'error' not in app:
-                return {
-                    'name': app.get('title', ''),
-                    'package': app.get('appId', ''),
-                    'appId': app.get('appId', ''),
-                    'version': app.get('version', ''),
-                    'size': app.get('size', ''),
-                    'icon': app.get('icon', ''),
-                    'developer': app.get('developer', ''),
-                    'description': app.get('summary', ''),
-                    'score': app.get('score', 0),
-                    'url': app.get('url', ''),
-                    'source': 'google',
-                    'category': app.get('genre', '')
-                }
+        return _format_app(gplay_request('app', {'appId': package_name}, timeout=15))
     except Exception as e:
         print(f"Google Play app error: {e}")
     return None
 
+async def get_google_play_app_async(package_name: str) -> Optional[Dict]:
+    try:
+        return _format_app(await gplay_request_async('app', {'appId': package_name}, timeout=15))
+    except Exception as e:
+        print(f"Google Play app error: {e}")
+    return None
+
+async def get_latest_version_async(package_name: str) -> str:
+    """
+    Current upstream version of a package, looked up the same way /download
+    picks its source (Google Play for package names, then apkdone); cached for
+    VERSION_CACHE_TTL, and '' when unknown
+    """
+    version = _version_cache.get(package_name)
+    if version is not None:
+        return version
+
+    version = ''
+    if is_package_name(package_name):
+        app = await get_google_play_app_async(package_name)
+        version = (app or {}).get('version', '') or ''
+    if version.strip().lower() in UNKNOWN_VERSIONS:
+        from scraper import BASE_URL, get_app_details_async
+        try:
+            details = await get_app_details_async(f"{BASE_URL}/{package_name}/")
+            version = details.get('version', '') or ''
+        except Exception as e:
+            print(f"Version lookup failed for {package_name}: {e}")
+    version = version.strip()
+    if version.lower() in UNKNOWN_VERSIONS:
+        version = ''
+    _version_cache.set(package_name, version)
+    return version
+
+def _cache_google_results(google_results: List[Dict]):
+    entries = []
+    for app in google_results:
+        slug = app.get('name', '').lower().replace(' ', '-')
+        slug = re.sub(r'[^a-z0-9-]', '', slug)
+        entries.append({'slug': slug, 'package': app.get('package', ''), 'title': app.get('name', ''), 'icon': app.get('icon', '')})
+    cache_packages(entries)
+
+def _search_apkdone(query: str, num: int) -> List[Dict]:
+    from scraper import search_website
+    apps = search_website(query)[:num]
+    for app in apps:
+        app['source'] = 'apkdone'
+    return apps
+
+async def _search_apkdone_async(query: str, num: int) -> List[Dict]:
+    from scraper import search_website_async
+    apps = (await search_website_async(query))[:num]
+    for app in apps:
+        app['source'] = 'apkdone'
+    return apps
+
+def _search_google(query: str, num: int) -> List[Dict]:
+    apps = search_google_play(query, num)
+    _cache_google_results(apps)
+    return apps
+
+async def _search_google_async(query: str, num: int) -> List[Dict]:
+    apps = await search_google_play_async(query, num)
+    await asyncio.to_thread(_cache_google_results, apps)
+    return apps
+
+def _is_relevant(app: Dict, query_lower: str) -> bool:
+    name = app.get('name', '').lower()
+    return query_lower in name or any(word in name for word in query_lower.split())
+
+def _normalize_name(name: str) -> str:
+    # Remove common suffixes for comparison
+    name = name.lower()
+    for suffix in [' - aio tunnel vpn', ' vpn', ' pro', ' plus', ' vip', ' mod', ' premium']:
+        name = name.replace(suffix, '')
+    return name.strip()
+
+def _apkdone_fills_results(apkdone_results: List[Dict], query: str, num: int) -> bool:
+    """True when relevant apkdone hits alone fill the page, so Google can't change the merge"""
+    query_lower = query.lower().strip()
+    relevant = [app for app in apkdone_results if _is_relevant(app, query_lower)]
+    # Same dedup as the real merge; irrelevant hits rank below Google's, so they don't count
+    merged = merge_results({'apkdone': relevant, 'google': [], 'combined': []}, query, num)
+    return len(merged['combined']) >= num
+
 def combined_search(query: str, num: int = 10) -> Dict[str, Any]:
     """
     Combined search: searches both apkdone and Google Play
     Interleaves results to show both sources, prioritizing exact matches
+    Both sources run in parallel, each bounded by its own deadline
     """
-    from scraper import search_website
-    
     results = {
         'apkdone': [],
         'google': [],
         'combined': []
     }
     
-    query_lower = query.lower().strip()
+    started = time.monotonic()
+    apkdone_future = _search_executor.submit(_search_apkdone, query, num)
+    google_future = _search_executor.submit(_search_google, query, num)
     
-    # Get results from apkdone
     try:
-        apkdone_results = search_website(query)
-        for app in apkdone_results[:num]:
-            app['source'] = 'apkdone'
-            results['apkdone'].append(app)
+        results['apkdone'] = apkdone_future.result(timeout=APKDONE_DEADLINE)
+    except TimeoutError:
+        print(f"apkdone search missed its {APKDONE_DEADLINE}s deadline")
     except Exception as e:
         print(f"apkdone search failed: {e}")
     
-    # Always search Google Play for better coverage
+    # Google keeps running in the background (it still warms the package cache)
+    if not _apkdone_fills_results(results['apkdone'], query, num):
+        remaining = max(0, GOOGLE_DEADLINE - (time.monotonic() - started))
+        try:
+            results['google'] = google_future.result(timeout=remaining)
+        except TimeoutError:
+            print(f"Google Play search missed its {GOOGLE_DEADLINE}s deadline")
+        except Exception as e:
+            print(f"Google Play search failed: {e}")
+    
+    return merge_results(results, query, num)
+
+async def combined_search_async(query: str, num: int = 10) -> Dict[str, Any]:
+    """Awaitable combined_search that never blocks the event loop"""
+    results = {
+        'apkdone': [],
+        'google': [],
+        'combined': []
+    }
+    
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    apkdone_task = asyncio.create_task(_search_apkdone_async(query, num))
+    google_task = asyncio.create_task(_search_google_async(query, num))
+    
     try:
-        google_results = search_google_play(query, num)
-        for app in google_results:
-            app['source'] = 'google'
-            results['google'].append(app)
-            
-            slug = app.get('name', '').lower().replace(' ', '-')
-            slug = re.sub(r'[^a-z0-9-]', '', slug)
-            cache_package(slug, app.get('package', ''), app.get('name', ''), app.get('icon', ''))
+        results['apkdone'] = await asyncio.wait_for(apkdone_task, APKDONE_DEADLINE)
+    except asyncio.TimeoutError:
+        print(f"apkdone search missed its {APKDONE_DEADLINE}s deadline")
     except Exception as e:
-        print(f"Google Play search failed: {e}")
+        print(f"apkdone search failed: {e}")
+    
+    if not _apkdone_fills_results(results['apkdone'], query, num):
+        remaining = max(0, GOOGLE_DEADLINE - (loop.time() - started))
+        try:
+            results['google'] = await asyncio.wait_for(asyncio.shield(google_task), remaining)
+        except asyncio.TimeoutError:
+            print(f"Google Play search missed its {GOOGLE_DEADLINE}s deadline")
+        except Exception as e:
+            print(f"Google Play search failed: {e}")
+    
+    if not google_task.done():
+        _background_tasks.add(google_task)
+        google_task.add_done_callback(_background_tasks.discard)
+    
+    return merge_results(results, query, num)
+
+def merge_results(results: Dict[str, List[Dict]], query: str, num: int = 10) -> Dict[str, Any]:
+    """Merge per-source results into results['combined'] using priority/dedup rules"""
+    query_lower = query.lower().strip()
     
     # Combine results prioritizing apkdone (more reliable downloads) over Google
     seen_names = set()
     seen_packages = set()
     
-    # Helper to check if app name matches query
-    def is_relevant(app):
-        name = app.get('name', '').lower()
-        return query_lower in name or any(word in name for word in query_lower.split())
-    
-    # Helper to normalize name for comparison
-    def normalize_name(name):
-        # Remove common suffixes for comparison
-        name = name.lower()
-        for suffix in [' - aio tunnel vpn', ' vpn', ' pro', ' plus', ' vip', ' mod', ' premium']:
-            name = name.replace(suffix, '')
-        return name.strip()
-    
     # 1. Add relevant apkdone results FIRST (priority for downloads)
     for app in results['apkdone']:
         name_key = app.get('name', '').lower()
-        norm_name = normalize_name(name_key)
-        if name_key not in seen_names and is_relevant(app):
+        norm_name = _normalize_name(name_key)
+        if name_key not in seen_names and _is_relevant(app, query_lower):
             results['combined'].append(app)
             seen_names.add(name_key)
             seen_names.add(norm_name)  # Also mark normalized name as seen
@@ -223,12 +336,12 @@ def combined_search(query: str, num: int = 10) -> Dict[str, Any]:
     # 2. Add relevant Google results (skip if similar app already from apkdone)
     for app in results['google']:
         name_key = app.get('name', '').lower()
-        norm_name = normalize_name(name_key)
+        norm_name = _normalize_name(name_key)
         pkg = app.get('package', '')
         # Skip if name or normalized name already exists
         if name_key in seen_names or norm_name in seen_names or pkg in seen_packages:
             continue
-        if is_relevant(app):
+        if _is_relevant(app, query_lower):
             results['combined'].append(app)
             seen_names.add(name_key)
             seen_packages.add(pkg)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Hedged source racing
+Candidate sources start best first. The next one joins as soon as a running
+source fails, or once every running source has gone `hedge_delay` seconds
+without receiving a byte, so a healthy transfer is never duplicated however
+long it takes. The first valid file wins and the rest are cancelled. A
+negative delay only moves on after a failure (the old sequential behaviour),
+0 starts every source at once.
+"""
+import time
+import asyncio
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from download_coordinator import DownloadProgress
+
+ZIP_MAGIC = b"PK\x03\x04"  # APK and XAPK are both zip archives
+POLL_INTERVAL = 0.25
+
+class RaceFailed(Exception):
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors) or "no sources")
+        self.errors = errors
+
+def is_valid_apk(path) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(4) == ZIP_MAGIC
+    except OSError:
+        return False
+
+class _Racer:
+    def __init__(self, name: str):
+        self.name = name
+        self.progress = DownloadProgress()
+        self.seen = 0
+        self.moved_at = time.monotonic()  # launch, then the last time a byte arrived
+
+    def check(self, now: float) -> float:
+        """Seconds since this racer last received data"""
+        if self.progress.downloaded > self.seen:
+            self.seen = self.progress.downloaded
+            self.moved_at = now
+        return now - self.moved_at
+
+def _publish(progress: Optional[DownloadProgress], racer: _Racer):
+    if progress is not None and racer.progress.updated_at is not None:
+        progress.update(racer.progress.downloaded, racer.progress.total, racer.progress.speed)
+
+async def race(candidates: List[Tuple[str, Callable[[DownloadProgress], Awaitable[Tuple[Path, str]]]]],
+               hedge_delay: float = -1, progress: Optional[DownloadProgress] = None,
+               validate: Callable[[Path], bool] = is_valid_apk) -> Tuple[Path, str]:
+    """
+    candidates: (name, factory) pairs, best first; each factory is called with
+    its own DownloadProgress and returns (file path, source label) or raises.
+    progress, if given, mirrors the racer that has downloaded the most and
+    finally the winner. Returns the first valid result.
+    """
+    racers = {}
+    errors = []
+    queue = list(candidates)
+
+    def launch():
+        name, factory = queue.pop(0)
+        racer = _Racer(name)
+        racers[asyncio.ensure_future(factory(racer.progress))] = racer
+
+    launch()
+    while queue and hedge_delay == 0:
+        launch()
+    try:
+        while racers:
+            done, _ = await asyncio.wait(racers, timeout=POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+            now = time.monotonic()
+            idle = {task: racer.check(now) for task, racer in racers.items()}
+            _publish(progress, max(racers.values(), key=lambda racer: racer.progress.downloaded))
+
+            for task in done:
+                racer = racers.pop(task)
+                if task.exception() is not None:
+                    errors.append(f"{racer.name}: {task.exception()}")
+                elif validate(task.result()[0]):
+                    _publish(progress, racer)
+                    return task.result()
+                else:
+                    errors.append(f"{racer.name}: not a valid APK")
+                if queue:
+                    launch()
+
+            stalled = [task for task in racers if task in idle and idle[task] >= hedge_delay]
+            if queue and hedge_delay > 0 and stalled and len(stalled) == len(racers):
+                print(f"Hedging: starting {queue[0][0]}; no data from "
+                      f"{', '.join(racers[task].name for task in stalled)} for {hedge_delay:g}s")
+                launch()
+        raise RaceFailed(errors)
+    finally:
+        for task in racers:
+            task.cancel()
+        if racers:
+            await asyncio.gather(*racers, return_exceptions=True)
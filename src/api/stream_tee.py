@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tee downloads - fetch a file once while clients follow along
+The upstream body is written to a staging file as it arrives, and any number
+of readers tail that file from the start, so the first bytes reach the client
+seconds after the upstream responds instead of after the whole file is on disk
+"""
+import os
+import sys
+import time
+import asyncio
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from scraper import get_async_client, host_slot_async, filename_from_response
+
+CHUNK_SIZE = 256 * 1024
+DOWNLOAD_TIMEOUT = 120
+# Writes go to a thread in batches: up to WRITE_BATCH bytes, or whatever arrived within WRITE_LATENCY seconds
+WRITE_BATCH = 1024 * 1024
+WRITE_LATENCY = 0.1
+
+class TeeDownload:
+    def __init__(self, url: str):
+        self.url = url
+        self.path: Optional[Path] = None
+        self.filename = ""
+        self.total = 0  # 0 when the upstream sends no Content-Length
+        self.written = 0
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._ready = asyncio.Event()  # headers received (or the download failed first)
+        self._changed = asyncio.Condition()
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    @staticmethod
+    def _write(f, data: bytes):
+        f.write(data)
+        f.flush()
+
+    async def _flush(self, f, buffer: bytearray, progress):
+        await asyncio.to_thread(self._write, f, bytes(buffer))
+        self.written += len(buffer)
+        buffer.clear()
+        if progress is not None:
+            progress.update(self.written, self.total)
+        await self._notify()
+
+    async def run(self, output_dir, progress=None) -> Path:
+        """Download into output_dir; returns the finished file's path"""
+        try:
+            client = get_async_client()
+            request = client.build_request("GET", self.url, timeout=DOWNLOAD_TIMEOUT)
+            async with host_slot_async(self.url):
+                response = await client.send(request, stream=True)
+            try:
+                response.raise_for_status()
+                self.filename = filename_from_response(response.headers, response.url)
+                self.total = int(response.headers.get("content-length", 0) or 0)
+                self.path = Path(output_dir) / self.filename
+                with open(self.path, "wb") as f:
+                    self._ready.set()
+                    buffer = bytearray()
+                    last_write = time.monotonic()
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        buffer += chunk
+                        if len(buffer) >= WRITE_BATCH or time.monotonic() - last_write >= WRITE_LATENCY:
+                            await self._flush(f, buffer, progress)
+                            last_write = time.monotonic()
+                    if buffer:
+                        await self._flush(f, buffer, progress)
+            finally:
+                await response.aclose()
+            self.done = True
+            return self.path
+        except BaseException as e:
+            self.error = e
+            raise
+        finally:
+            self._ready.set()
+            await self._notify()
+
+    async def wait_ready(self) -> bool:
+        """True once bytes are flowing; False if the download failed before that"""
+        await self._ready.wait()
+        return self.path is not None and self.error is None
+
+    def open_reader(self):
+        """
+        Open the file being written. Do this right after wait_ready(): once the
+        download finishes the file is moved into the artifact store, and an
+        already open handle keeps working while a late open raises FileNotFoundError.
+        """
+        return open(self.path, "rb")
+
+    async def follow(self, f, offset: int = 0) -> AsyncIterator[bytes]:
+        """Yield the file from offset as it is written; raises if the download fails midway"""
+        with f:
+            while True:
+                if offset < self.written:
+                    data = await asyncio.to_thread(os.pread, f.fileno(), min(CHUNK_SIZE, self.written - offset), offset)
+                    offset += len(data)
+                    yield data
+                    continue
+                if self.error is not None:
+                    raise RuntimeError(f"Upstream download failed: {self.error}")
+                if self.done:
+                    return
+                async with self._changed:
+                    await self._changed.wait_for(lambda: self.written > offset or self.done or self.error is not None)
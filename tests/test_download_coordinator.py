@@ -0,0 +1,98 @@
+import sys
+import asyncio
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "api"))
+from download_coordinator import DownloadCoordinator, DownloadProgress
+
+def test_progress():
+    progress = DownloadProgress()
+    assert progress.to_dict()["percent"] is None
+    progress.update(250, 1000, 50)
+    info = progress.to_dict()
+    assert (info["downloaded"], info["total"], info["percent"], info["speed"]) == (250, 1000, 25.0, 50)
+    assert info["eta"] == 15.0
+
+def test_job_states_and_progress():
+    async def main():
+        halfway = asyncio.Event()
+        release = asyncio.Event()
+
+        async def download(package, progress):
+            progress.update(512, 1024, 100)
+            halfway.set()
+            await release.wait()
+            progress.update(1024, 1024, 100)
+            return f"{package}.apk"
+
+        downloads = DownloadCoordinator(concurrency=1)
+        try:
+            job = downloads.submit("a", download, "a")
+            assert job.state == "queued" and downloads.stats()["queued"] == 1
+            await halfway.wait()
+            seen = job.to_dict()
+            release.set()
+            result = await downloads.wait(job)
+            return job, seen, result, downloads
+        finally:
+            await downloads.close()
+
+    job, seen, result, downloads = asyncio.run(main())
+    assert seen["status"] == "running" and seen["progress"]["percent"] == 50.0
+    assert result == "a.apk"
+    assert job.state == "done" and job.progress.downloaded == 1024
+    assert job.started_at <= job.finished_at
+    assert downloads.active("a") is None and downloads.latest("a") is job and downloads.get(job.id) is job
+
+def test_failed_job():
+    async def download(progress):
+        raise RuntimeError("all direct links failed")
+
+    async def main():
+        downloads = DownloadCoordinator()
+        try:
+            job = downloads.submit("a", download)
+            with pytest.raises(RuntimeError):
+                await downloads.wait(job)
+            await asyncio.sleep(0)
+            return job, downloads
+        finally:
+            await downloads.close()
+
+    job, downloads = asyncio.run(main())
+    assert job.to_dict()["status"] == "failed" and job.error == "all direct links failed"
+    assert downloads.active("a") is None
+
+def test_same_package_joins_and_concurrency_is_bounded():
+    running = []
+
+    async def main():
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def download(package, progress):
+            running.append(package)
+            started.set()
+            await release.wait()
+            return package
+
+        downloads = DownloadCoordinator(concurrency=1)
+        try:
+            first = downloads.submit("a", download, "a")
+            again = downloads.submit("a", download, "a")
+            other = downloads.submit("b", download, "b")
+            await started.wait()
+            states = (first.state, other.state)
+            release.set()
+            results = await asyncio.gather(downloads.wait(again), downloads.wait(other))
+            return first, again, states, results, downloads.stats()
+        finally:
+            await downloads.close()
+
+    first, again, states, results, stats = asyncio.run(main())
+    assert again is first
+    assert states == ("running", "queued")
+    assert results == ["a", "b"] and running == ["a", "b"]
+    assert (stats["started"], stats["joined"]) == (2, 1)
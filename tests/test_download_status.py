@@ -0,0 +1,60 @@
+import sys
+import asyncio
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "api"))
+import api_server
+from artifact_store import ArtifactStore
+from download_coordinator import DownloadCoordinator
+
+PACKAGE = "com.example.app"
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ArtifactStore(tmp_path / "downloads", tmp_path / "artifacts.db")
+    monkeypatch.setattr(api_server, "artifacts", store)
+    monkeypatch.setattr(api_server, "downloads", DownloadCoordinator(concurrency=1))
+    return store
+
+def ingest(store, tmp_path):
+    apk = tmp_path / "app.apk"
+    apk.write_bytes(b"PK\x03\x04" + b"\0" * 100)
+    store.ingest(PACKAGE, apk, source="apkdone", version="1.0")
+
+async def status_after(job_func):
+    downloads = api_server.downloads
+    try:
+        job = downloads.submit(PACKAGE, job_func)
+        await asyncio.gather(job.result, return_exceptions=True)
+        await asyncio.sleep(0)
+        return await api_server.check_download_status(PACKAGE)
+    finally:
+        await downloads.close()
+
+async def failing(progress):
+    raise RuntimeError("upstream unavailable")
+
+async def succeeding(progress):
+    return None
+
+def test_cached_artifact_with_failed_refresh_is_ready(store, tmp_path):
+    ingest(store, tmp_path)
+    status = asyncio.run(status_after(failing))
+    assert status["status"] == "ready"
+    assert status["version"] == "1.0"
+    assert status["refresh"]["status"] == "failed"
+    assert status["refresh"]["error"] == "upstream unavailable"
+
+def test_failed_download_without_artifact_reports_job(store):
+    status = asyncio.run(status_after(failing))
+    assert status["status"] == "failed"
+
+def test_finished_job_without_artifact_is_not_found(store):
+    assert asyncio.run(status_after(succeeding)) == {"status": "not_found"}
+
+def test_cached_artifact_without_job(store, tmp_path):
+    ingest(store, tmp_path)
+    status = asyncio.run(api_server.check_download_status(PACKAGE))
+    assert status["status"] == "ready" and "refresh" not in status
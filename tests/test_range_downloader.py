@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+import pytest
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import range_downloader
+from range_downloader import RangeDownload, RangeNotSupported, plan_ranges, MIN_RANGE_SIZE
+
+SIZE = 4 * MIN_RANGE_SIZE  # four connections' worth
+DATA = os.urandom(SIZE)
+
+class RangeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        header = self.headers.get("Range", "")
+        if not server.ranges or not header.startswith("bytes="):
+            self.send_response(200)
+            self.send_header("Content-Length", str(SIZE))
+            self.end_headers()
+            self.wfile.write(DATA)
+            return
+        start, end = (int(value) for value in header[len("bytes="):].split("-"))
+        with server.lock:
+            server.requested.append((start, end))
+        body = DATA[start:end + 1]
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{end}/{SIZE}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if server.cut_after is not None:
+            body = body[:server.cut_after]  # drop the connection mid-range
+            self.close_connection = True
+        self.wfile.write(body)
+        with server.lock:
+            server.sent += len(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    server.ranges = True
+    server.cut_after = None
+    server.requested = []
+    server.sent = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture(autouse=True)
+def small_buffers(monkeypatch):
+    monkeypatch.setattr(range_downloader, "READ_CHUNK", 16 * 1024)
+    monkeypatch.setattr(range_downloader, "WRITE_BUFFER", 64 * 1024)
+    monkeypatch.setattr(range_downloader, "CHECKPOINT_INTERVAL", 0.05)
+    monkeypatch.setattr(range_downloader, "RANGE_RETRIES", 0)
+
+def download(server, path, connections=4):
+    url = f"http://127.0.0.1:{server.server_port}/app.apk"
+    return RangeDownload(requests.Session(), url, path, SIZE, validator='"v1"', connections=connections)
+
+def test_plan_ranges():
+    assert plan_ranges(10, connections=3, min_size=1) == [[0, 3], [4, 7], [8, 9]]
+    assert plan_ranges(10, connections=8, min_size=5) == [[0, 4], [5, 9]]
+    assert plan_ranges(10, connections=8, min_size=100) == [[0, 9]]
+
+def test_parallel_download(server, tmp_path):
+    path = tmp_path / "app.apk"
+    assert download(server, path).run() == str(path)
+    assert path.read_bytes() == DATA
+    assert len(server.requested) == 4
+    assert not os.path.exists(f"{path}.part") and not os.path.exists(f"{path}.part.json")
+
+def test_resume_after_interruption(server, tmp_path):
+    path = tmp_path / "app.apk"
+    server.cut_after = 300 * 1024
+    with pytest.raises(Exception):
+        download(server, path).run()
+    with open(f"{path}.part.json") as f:
+        saved = json.load(f)["ranges"]
+    kept = sum(done for start, end, done in saved)
+    assert 0 < kept < SIZE
+
+    server.cut_after = None
+    server.requested.clear()
+    server.sent = 0
+    download(server, path).run()
+    assert path.read_bytes() == DATA
+    assert server.sent == SIZE - kept
+    assert sorted(server.requested) == sorted((start + done, end) for start, end, done in saved if start + done <= end)
+
+def test_changed_validator_restarts(server, tmp_path):
+    path = tmp_path / "app.apk"
+    server.cut_after = 300 * 1024
+    with pytest.raises(Exception):
+        download(server, path).run()
+
+    server.cut_after = None
+    server.sent = 0
+    changed = download(server, path)
+    changed.validator = '"v2"'
+    changed.run()
+    assert path.read_bytes() == DATA
+    assert server.sent == SIZE
+
+def test_server_without_ranges(server, tmp_path):
+    server.ranges = False
+    with pytest.raises(RangeNotSupported):
+        download(server, tmp_path / "app.apk").run()
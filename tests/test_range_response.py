@@ -0,0 +1,133 @@
+import sys
+from pathlib import Path
+from urllib.parse import unquote
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "api"))
+from range_response import parse_range, file_response, content_disposition, RangeNotSatisfiable, MAX_RANGES
+
+SIZE = 1000
+DATA = bytes(i % 251 for i in range(SIZE))
+ETAG = "abc123"
+UNICODE_NAME = 'Телеграм "X" 2.apk'
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "app.apk"
+    path.write_bytes(DATA)
+    app = FastAPI()
+
+    @app.get("/file")
+    async def serve(request: Request):
+        return file_response(request, str(path), "app.apk", SIZE, ETAG, "application/vnd.android.package-archive")
+
+    @app.get("/unicode")
+    async def serve_unicode(request: Request):
+        return file_response(request, str(path), UNICODE_NAME, SIZE, ETAG, "application/vnd.android.package-archive")
+
+    return TestClient(app)
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", [(0, 99)]),
+    ("bytes=900-", [(900, 999)]),
+    ("bytes=-100", [(900, 999)]),
+    ("bytes=990-5000", [(990, 999)]),
+    ("bytes=0-9, 5-20, 100-109", [(0, 20), (100, 109)]),
+    ("bytes=10-19,20-29", [(10, 29)]),
+    ("bytes=500-599,0-9", [(0, 9), (500, 599)]),
+    ("BYTES = 0-0", [(0, 0)]),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, SIZE) == expected
+
+@pytest.mark.parametrize("header", [
+    "items=0-3",
+    "bytes=9-3",
+    "bytes=abc",
+    "bytes=5",
+    "bytes=",
+    "bytes=" + ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(MAX_RANGES + 1)),
+])
+def test_parse_range_ignored(header):
+    assert parse_range(header, SIZE) is None
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5000-6000", "bytes=-0"])
+def test_parse_range_not_satisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, SIZE)
+
+def test_full_file(client):
+    response = client.get("/file")
+    assert response.status_code == 200
+    assert response.content == DATA
+    assert response.headers["etag"] == f'"{ETAG}"'
+    assert response.headers["accept-ranges"] == "bytes"
+
+def test_single_range(client):
+    response = client.get("/file", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{SIZE}"
+    assert response.content == DATA[100:200]
+
+def test_multiple_ranges(client):
+    response = client.get("/file", headers={"Range": "bytes=0-9,500-509"})
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1].encode()
+    assert int(response.headers["content-length"]) == len(response.content)
+    parts = response.content.split(b"--" + boundary)
+    assert parts[-1] == b"--\r\n"
+    bodies = [part.split(b"\r\n\r\n", 1)[1][:-2] for part in parts[1:-1]]
+    assert bodies == [DATA[0:10], DATA[500:510]]
+    assert b"Content-Range: bytes 500-509/1000" in parts[2]
+
+@pytest.mark.parametrize("header", [
+    "items=0-3",
+    "bytes=9-3",
+    "bytes=" + ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(20)),
+])
+def test_ignored_range_sends_whole_file(client, header):
+    response = client.get("/file", headers={"Range": header})
+    assert response.status_code == 200
+    assert response.content == DATA
+    assert "content-range" not in response.headers
+
+def test_unsatisfiable_range(client):
+    response = client.get("/file", headers={"Range": "bytes=2000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{SIZE}"
+
+def test_if_range_mismatch_sends_whole_file(client):
+    response = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == DATA
+
+def test_if_range_match(client):
+    response = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": f'"{ETAG}"'})
+    assert response.status_code == 206
+    assert response.content == DATA[:10]
+
+def test_if_none_match(client):
+    response = client.get("/file", headers={"If-None-Match": f'"{ETAG}"'})
+    assert response.status_code == 304
+
+def test_content_disposition_ascii():
+    assert content_disposition("app.apk") == 'attachment; filename="app.apk"'
+
+def test_content_disposition_unicode():
+    header = content_disposition(UNICODE_NAME)
+    header.encode("latin-1")  # must be sendable as an HTTP header
+    fallback, _, encoded = header.partition("; filename*=utf-8''")
+    assert fallback == 'attachment; filename="________ _X_ 2.apk"'
+    assert unquote(encoded) == UNICODE_NAME
+
+@pytest.mark.parametrize("headers, status", [({"Range": "bytes=0-99"}, 206), ({}, 200)])
+def test_unicode_filename(client, headers, status):
+    response = client.get("/unicode", headers=headers)
+    assert response.status_code == status
+    assert response.headers["content-disposition"] == content_disposition(UNICODE_NAME)
+    assert response.content == (DATA[:100] if status == 206 else DATA)
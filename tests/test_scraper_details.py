@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from scraper import fill_details_from_download_page
+
+def details(**fields):
+    return {"version": "", "size": "", "requirements": "", "last_updated": "", **fields}
+
+def test_download_page_first_size_wins():
+    html = "<div><p>App Size: 50 MB</p><p>Full Size 120 MB</p></div>"
+    result = fill_details_from_download_page(details(version="1.0", requirements="Android 8.0"), html)
+    assert result["size"] == "50 MB"
+
+def test_download_page_fills_fields_independently():
+    html = "<div><p>Version 2.5.1 Size 30 MB Requires Android 7.0</p></div>"
+    result = fill_details_from_download_page(details(), html)
+    assert (result["version"], result["size"], result["requirements"]) == ("2.5.1", "30 MB", "Android 7.0")
+
+def test_download_page_keeps_filled_fields():
+    html = "<p>Other Size 99 MB</p>"
+    result = fill_details_from_download_page(details(version="1.0", size="10 MB", requirements="Android 6"), html)
+    assert result["size"] == "10 MB"
+
+def test_labelled_rows_take_precedence():
+    html = "<table><tr><td>Size</td><td>42 MB</td></tr></table><p>Bundle Size 7 MB</p>"
+    result = fill_details_from_download_page(details(version="1.0", requirements="Android 8.0"), html)
+    assert result["size"] == "42 MB"
@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "api"))
+import search_orchestrator
+from search_orchestrator import _apkdone_fills_results, combined_search, merge_results
+
+def apps(*names):
+    return [{"name": name, "package": ""} for name in names]
+
+@pytest.mark.parametrize("names, num, expected", [
+    (("Spotify Premium", "Spotify"), 2, False),  # same app once normalized
+    (("Spotify Premium", "Spotify Lite"), 2, True),
+    (("Spotify", "Deezer"), 2, False),  # Deezer is irrelevant, Google outranks it
+    (("Spotify",), 1, True),
+    ((), 1, False),
+])
+def test_apkdone_fills_results(names, num, expected):
+    assert _apkdone_fills_results(apps(*names), "spotify", num) is expected
+
+def test_fills_results_matches_merge():
+    apkdone = apps("Spotify Premium", "Spotify", "Spotify Lite")
+    merged = merge_results({"apkdone": list(apkdone), "google": [], "combined": []}, "spotify", 2)
+    assert len(merged["combined"]) == 2
+    assert _apkdone_fills_results(apkdone, "spotify", 2)
+
+def test_duplicate_apkdone_names_still_ask_google(monkeypatch):
+    monkeypatch.setattr(search_orchestrator, "_search_apkdone",
+                        lambda query, num: apps("Spotify Premium", "Spotify"))
+    monkeypatch.setattr(search_orchestrator, "_search_google",
+                        lambda query, num: [{"name": "Spotify Kids", "package": "com.spotify.kids"}])
+    results = combined_search("spotify", 2)
+    assert [app["name"] for app in results["combined"]] == ["Spotify Premium", "Spotify Kids"]
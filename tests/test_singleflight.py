@@ -0,0 +1,85 @@
+import sys
+import asyncio
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "api"))
+from singleflight import SingleFlight
+
+def test_concurrent_callers_share_one_call():
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return {"key": key}
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", fetch, "k") for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert calls == ["k"]
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"in_flight": 0, "started": 1, "coalesced": 4}
+
+def test_exception_reaches_every_caller():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(3)), return_exceptions=True)
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) and str(result) == "upstream down" for result in results)
+    assert flight.in_flight() == 0
+
+def test_finished_call_is_not_reused():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        flight = SingleFlight()
+        return await flight.do("k", fetch), await flight.do("k", fetch)
+
+    assert asyncio.run(main()) == (1, 2)
+
+def test_different_keys_run_separately():
+    async def fetch(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(flight.do("a", fetch, 1), flight.do("b", fetch, 2))
+
+    assert asyncio.run(main()) == [1, 2]
+
+def test_cancelled_caller_does_not_cancel_others():
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        flight = SingleFlight()
+        impatient = asyncio.ensure_future(flight.do("k", fetch))
+        patient = asyncio.ensure_future(flight.do("k", fetch))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        return await patient
+
+    assert asyncio.run(main()) == "done"
@@ -0,0 +1,105 @@
+import sys
+import asyncio
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "api"))
+import api_server
+import source_race
+from source_race import race, RaceFailed
+from download_coordinator import DownloadProgress
+
+APK = b"PK\x03\x04" + b"\0" * 60
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(source_race, "POLL_INTERVAL", 0.01)
+
+class FakeSource:
+    """Writes APK to tmp_path/name after `delay` seconds, or stalls until cancelled"""
+
+    def __init__(self, tmp_path, name, delay=0.0, stall=False, error=None, data=APK):
+        self.path = tmp_path / f"{name}.apk"
+        self.name = name
+        self.delay = delay
+        self.stall = stall
+        self.error = error
+        self.data = data
+        self.started = False
+        self.cancelled = False
+
+    async def __call__(self, progress):
+        self.started = True
+        try:
+            await asyncio.sleep(3600 if self.stall else self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise RuntimeError(self.error)
+        progress.update(len(self.data), len(self.data), 1000)
+        self.path.write_bytes(self.data)
+        return self.path, self.name
+
+def test_first_source_wins_without_hedging(tmp_path):
+    first, second = FakeSource(tmp_path, "a", 0.05), FakeSource(tmp_path, "b")
+    result = asyncio.run(race([("a", first), ("b", second)], hedge_delay=1))
+    assert result == (first.path, "a")
+    assert not second.started
+
+def test_stalled_source_loses_to_hedge(tmp_path):
+    stalled, backup = FakeSource(tmp_path, "a", stall=True), FakeSource(tmp_path, "b")
+    progress = DownloadProgress()
+    result = asyncio.run(race([("a", stalled), ("b", backup)], hedge_delay=0.05, progress=progress))
+    assert result == (backup.path, "b")
+    assert stalled.cancelled
+    assert progress.downloaded == len(APK)
+
+def test_negative_delay_waits_for_failure(tmp_path):
+    slow, backup = FakeSource(tmp_path, "a", 0.2), FakeSource(tmp_path, "b")
+    assert asyncio.run(race([("a", slow), ("b", backup)], hedge_delay=-1)) == (slow.path, "a")
+    assert not backup.started
+
+def test_failure_launches_next(tmp_path):
+    broken, backup = FakeSource(tmp_path, "a", error="HTTP 403"), FakeSource(tmp_path, "b")
+    assert asyncio.run(race([("a", broken), ("b", backup)], hedge_delay=-1)) == (backup.path, "b")
+
+def test_zero_delay_starts_everything(tmp_path):
+    slow, fast = FakeSource(tmp_path, "a", 0.5), FakeSource(tmp_path, "b")
+    assert asyncio.run(race([("a", slow), ("b", fast)], hedge_delay=0)) == (fast.path, "b")
+    assert slow.cancelled
+
+def test_invalid_file_is_rejected(tmp_path):
+    html, good = FakeSource(tmp_path, "a", data=b"<html>"), FakeSource(tmp_path, "b")
+    assert asyncio.run(race([("a", html), ("b", good)], hedge_delay=-1)) == (good.path, "b")
+
+def test_all_sources_fail(tmp_path):
+    candidates = [("a", FakeSource(tmp_path, "a", error="HTTP 403")), ("b", FakeSource(tmp_path, "b", data=b"nope"))]
+    with pytest.raises(RaceFailed) as info:
+        asyncio.run(race(candidates, hedge_delay=-1))
+    assert info.value.errors == ["a: HTTP 403", "b: not a valid APK"]
+
+def test_stalled_direct_link_loses_to_next(tmp_path, monkeypatch):
+    cancelled = []
+
+    async def direct_links(package_name):
+        return ["https://mirror-a/app.apk", "https://mirror-b/app.apk"]
+
+    async def run_aria2c(url, output_dir, filename=None, referer=None, progress=None):
+        if "mirror-a" in url:
+            try:
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                cancelled.append(url)
+                raise
+        path = output_dir / "app.apk"
+        path.write_bytes(APK)
+        return True, path, ""
+
+    monkeypatch.setattr(api_server, "direct_links", direct_links)
+    monkeypatch.setattr(api_server, "run_aria2c", run_aria2c)
+    path, source = asyncio.run(api_server.fetch_package_into("some-app", tmp_path, False, "apkdone", 0.05))
+    assert path == tmp_path / "apkdone" / "link2" / "app.apk"
+    assert source == "aria2c+apkdone"
+    assert cancelled == ["https://mirror-a/app.apk"]